@@ -6,6 +6,11 @@
 
 from . import plot_helpers 
 from .autognuplot import AutoGnuplotFigure
+from .dataset_io import DatasetStore
+from .batch_render import render_many
+from .project import write_project_makefile
+from .figure_template import FigureTemplate
+from .render_stats import aggregate_render_stats
 
 AutogpyFigure = AutoGnuplotFigure
 Figure = AutoGnuplotFigure
@@ -0,0 +1,153 @@
+"""
+This file is part of Autognuplotpy, autogpy.
+
+Rendering from an asyncio event loop, without blocking it nor using threads.
+Not imported by `import autogpy` (asyncio is slow to import):
+
+>>> from autogpy.async_render import render_async, render_many_async
+"""
+import asyncio
+import os
+import signal
+import time
+import weakref
+
+from .batch_render import _generate, _render_result
+
+# default maximum number of concurrent renderings per event loop
+MAX_CONCURRENT_RENDERS = os.cpu_count() or 1
+
+_semaphores = weakref.WeakKeyDictionary()
+
+
+def get_semaphore():
+    """semaphore shared by the renderings of the running event loop, allowing
+    `MAX_CONCURRENT_RENDERS` at a time. Created at the first call.
+    """
+    loop = asyncio.get_running_loop()
+    if loop not in _semaphores:
+        _semaphores[loop] = asyncio.Semaphore(MAX_CONCURRENT_RENDERS)
+    return _semaphores[loop]
+
+
+def _kill(proc):
+    """kills `proc` and, on posix, the tools started by it (e.g. the latex toolchain of a compile script).
+    """
+    if proc.returncode is not None:
+        return
+    try:
+        if os.name == "posix":
+            os.killpg(proc.pid, signal.SIGKILL)
+        else:
+            proc.kill()
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+async def _run(command, cwd):
+    """runs `command` from `cwd`, returning stdout, stderr and return code.
+    If cancelled, the process is killed before re-raising.
+    """
+    try:
+        proc = await asyncio.create_subprocess_exec(*command
+                                                    , cwd = cwd
+                                                    , stdout = asyncio.subprocess.PIPE
+                                                    , stderr = asyncio.subprocess.PIPE
+                                                    , start_new_session = os.name == "posix")
+    except OSError as e:
+        return "", str(e), -1
+
+    try:
+        output, err = await proc.communicate()
+    except asyncio.CancelledError:
+        _kill(proc)
+        # reaps the process
+        await asyncio.shield(proc.wait())
+        raise
+
+    return output.decode(errors = "replace"), err.decode(errors = "replace"), proc.returncode
+
+
+async def render_async(figure
+                       , terminal = "pdflatex"
+                       , semaphore = None
+                       , return_bytes = False
+                       , generate = True):
+    """Generates and renders a figure without blocking the event loop.
+
+    Parameters
+    ----------------
+    figure: AutoGnuplotFigure
+    terminal: str, optional
+         ("pdflatex") see `AutoGnuplotFigure.get_render_command`.
+    semaphore: asyncio.Semaphore, optional
+         (None) bounds the concurrent renderings. Defaults to the one shared by the event loop (see `get_semaphore`).
+    return_bytes: bool, optional
+         (False) if True, the `output` of the result is the content of the rendered file instead of its path.
+    generate: bool, optional
+         (True) calls `generate_gnuplot_file` first. Generation (file writes, waits for the deferred
+         dataset writes) runs in the default executor of the loop; if it fails, an error result is
+         returned (see `RenderResult`).
+
+    Returns
+    ----------------
+    `RenderResult` (see `batch_render`). `output` is None if the rendering failed and `return_bytes` is set.
+
+    Cancelling the task kills the rendering tools.
+
+    Examples
+    ----------------
+    >>> result = await fig.render_async(terminal = "pngcairo", return_bytes = True)
+    >>> png = result.output
+    """
+    generate_time = 0.
+    if generate:
+        generate_time, error = await asyncio.get_running_loop().run_in_executor(
+            None, _generate, figure, terminal)
+        if error is not None:
+            return error
+
+    render_command = figure.get_render_command(terminal)
+    semaphore = get_semaphore() if semaphore is None else semaphore
+
+    async with semaphore:
+        t0 = time.time()
+        output, err, returncode = await _run(render_command['command'], render_command['cwd'])
+        render_time = time.time() - t0
+
+    result = _render_result(figure, terminal, render_command, generate_time, render_time
+                            , output, err, returncode)
+
+    if return_bytes:
+        content = None
+        if result.status == "ok" and result.output is not None:
+            with open(result.output, "rb") as f:
+                content = f.read()
+        result = result._replace(output = content)
+
+    return result
+
+
+async def render_many_async(figures
+                            , terminal = "pdflatex"
+                            , max_concurrency = None
+                            , return_bytes = False):
+    """Asyncio counterpart of `render_many`.
+
+    Parameters
+    ----------------
+    figures: iterable of AutoGnuplotFigure
+    terminal: str, optional
+         ("pdflatex") see `AutoGnuplotFigure.get_render_command`.
+    max_concurrency: int, optional
+         (None) maximum number of concurrent renderings. Defaults to the semaphore shared by the event loop.
+    return_bytes: bool, optional
+         (False) see `render_async`.
+
+    Returns
+    ----------------
+    list of `RenderResult`, in the order of `figures`.
+    """
+    semaphore = None if max_concurrency is None else asyncio.Semaphore(max_concurrency)
+    return list(await asyncio.gather(*[render_async(figure, terminal, semaphore, return_bytes)
+                                       for figure in figures]))
@@ -5,30 +5,69 @@ This file is part of Autognuplotpy, autogpy.
 from __future__ import print_function
 
 import os
+import sys
+import importlib.util
 import numpy as np
 import warnings
 from collections import OrderedDict
+import collections.abc
 import re
+import hashlib
+import filecmp
+import shutil
+import time
+import functools
 
 
 from . import autognuplot_terms
 from . import plot_helpers
-
-try:
-    import pandas as pd
-    import pandas
-    pandas_support_enabled = True
-    # print("pandas support enabled")
-except:
-    pandas_support_enabled = False
+from . import dataset_io
+from . import gnuplot_session
+from . import decimation
+from . import compression
+from . import sampling
+from . import histogram
+from . import kde as autogpy_kde
+from . import render_stats
+
+# optional dependencies are only looked up here, and imported where used
+pandas_support_enabled = importlib.util.find_spec("pandas") is not None
 
 warnings.simplefilter('once', UserWarning)
 
-try:
-    import pygments
-    pygments_support_enabled = True
-except:
-    pygments_support_enabled = False
+pygments_support_enabled = importlib.util.find_spec("pygments") is not None
+
+
+def _is_pandas_series(x):
+    """True if `x` is a `pd.Series`, without importing pandas: a Series
+    can only exist once pandas has been imported.
+    """
+    pandas = sys.modules.get("pandas")
+    return pandas is not None and isinstance(x, pandas.Series)
+
+
+@functools.lru_cache(maxsize = None)
+def _user_and_hostname():
+    """user and host names, looked up once per process (the lookup can be slow, e.g. with NSS/LDAP).
+    """
+    import socket
+    import getpass
+    return getpass.getuser(), socket.gethostname()
+
+
+def _was_there_an_error(output, err, returncode = 0):
+    """heuristic detection of errors in the output of the rendering tools.
+    """
+    #amending for the fit output
+    return "error" in output or\
+        "Error" in output or\
+        "error" in err or\
+        ("Error" in err and not "Standard Error" in err) or\
+        returncode != 0
+
+
+# version of the figure specifications, see `AutoGnuplotFigure.save_spec`
+SPEC_VERSION = 1
 
 
 class AutoGnuplotFigure(object):
@@ -57,6 +96,24 @@ class AutoGnuplotFigure(object):
              (100) conversion quality of the jpg image showed in a jupyter notebook. It is used for the conversion of the pdf image produced by gnuplot.
         anonymous: bool, optional
              (False) Specifies if a figure is generated in an anonymous folder. (Options as ssh sync and latex inclusion are turned off).
+        data_format: str, optional
+             ("text") Storage format of the datasets. `"binary"` (or `"binary64"`) and `"binary32"` write raw little-endian float64/float32 columns, read by gnuplot via a `binary` clause. Can be overridden in each `plot` call.
+        compress: str, optional
+             (None) Compresses the text datasets (`"gz"`, `"zstd"` or `"lz4"`), which gnuplot reads through a decompressing pipe (e.g. `"< gzip -dc 'fig__0__.dat.gz'"`). The matching command line tool is required at plot time. Can be overridden in each `plot` call.
+        data_storage: str, optional
+             ("files") Where the text datasets are kept. `"files"` writes one file per dataset, `"inline"` embeds them in the core gnuplot script as datablocks (`$DATA_N << EOD`), avoiding many small files. Datasets larger than `inline_max_bytes` (1 MiB, member variable) are written to files anyway, as are binary and compressed ones.
+        dataset_store: str, bool or `dataset_io.DatasetStore`, optional
+             (None) Stores datasets in a content-addressed store: files are named after the hash of the data and written only once. Pass a folder (which can be shared among figures) or `True` to use the figure folder.
+        gnuplot_session: bool, optional
+             (False) `jupyter_show` renders through a long-lived gnuplot process (see `gnuplot_session.get_session`) instead of spawning gnuplot at each call.
+        preview_mode: str, optional
+             ("latex") Preview shown in jupyter at the end of a `with` block. `"latex"` runs the epslatex (or tikz, if enabled) toolchain, `"cairo"` the fast `pngcairo` preview (see `jupyter_show_fast`).
+        deferred_writes: bool, optional
+             (False) `plot` and `fit` return before their datasets are written: the arrays are copied (memory-mapped ones are referenced) and 
+             serialized by a shared thread pool (see `dataset_io.get_write_executor`). `generate_gnuplot_file` waits for the pending writes 
+             (see `wait_dataset_writes`) and raises a `dataset_io.DatasetWriteError` naming the datasets that failed.
+        render_cache: bool, optional
+             (False) Caches the images rendered by `jupyter_show_pdflatex` and `jupyter_show_tikz`. The cache key hashes the gnuplot script, the datasets, the terminal parameters and the conversion density/quality. The final pdf is cached with the image: on a hit, both are restored if missing or different, and the cached image is displayed without running any process. The `render_cache_size` most recently used entries are kept.
 
         Returns
         --------------------
@@ -100,7 +157,15 @@ class AutoGnuplotFigure(object):
                  , hostname = None
                  , jpg_convert_density = 100
                  , jpg_convert_quality = 100
-                 , anonymous = False):
+                 , anonymous = False
+                 , data_format = "text"
+                 , compress = None
+                 , data_storage = "files"
+                 , dataset_store = None
+                 , deferred_writes = False
+                 , render_cache = False
+                 , gnuplot_session = False
+                 , preview_mode = "latex"):
         """ Creates an AutoGnuplotFigure object
 
         :param folder_name: str
@@ -112,6 +177,14 @@ class AutoGnuplotFigure(object):
         :param allow_strings: Bool
         :param hostname: str
         :oaran anonymous: Bool
+        :param data_format: str
+        :param compress: str
+        :param data_storage: str
+        :param dataset_store: str, Bool or DatasetStore
+        :param deferred_writes: Bool
+        :param render_cache: Bool
+        :param gnuplot_session: Bool
+        :param preview_mode: str
 
         """
         
@@ -127,7 +200,6 @@ class AutoGnuplotFigure(object):
                 print("created folder:", self.folder_name)
 
         self.global_file_identifier = self.folder_name + '/' + self.file_identifier
-        self.globalize_fname = lambda x : self.folder_name + '/' + x
 
         # will get name of user/host... This allows to create the scp copy script
         self.__hostname = hostname
@@ -136,6 +208,33 @@ class AutoGnuplotFigure(object):
         self.__dataset_counter = 0 
 
         self.datasetstring_template = "__{DS_ID}__{SPECS}.dat"
+        self.binary_datasetstring_template = "__{DS_ID}__{SPECS}.bin"
+
+        dataset_io.check_write_options(data_format, compress)
+        self.data_format = data_format
+        self.compress = compress
+
+        dataset_io.check_data_storage(data_storage)
+        self.data_storage = data_storage
+        self.inline_max_bytes = 1 << 20
+        # datablock name -> content, for data_storage = "inline"
+        self.__datablocks = OrderedDict()
+
+        if dataset_store is True:
+            dataset_store = self.folder_name
+        if isinstance(dataset_store, str):
+            dataset_store = dataset_io.DatasetStore(dataset_store)
+        self.dataset_store = dataset_store
+
+        # on-disk arrays referenced in place, i.e. not written by the figure
+        self.__inplace_datasets = set()
+
+        # timing and I/O statistics, see `render_stats.RenderStats`
+        self.render_stats = render_stats.RenderStats()
+
+        self.deferred_writes = deferred_writes
+        # (dataset_fname, future) of the deferred writes
+        self.__pending_writes = []
 
         self.datasets_to_plot = [ [] ]
         self.alter_multiplot_state = [  []  ] #the first altering block can be just global variables
@@ -148,6 +247,19 @@ class AutoGnuplotFigure(object):
 
         self.pdflatex_jpg_convert_density = jpg_convert_density
         self.pdflatex_jpg_convert_quality = jpg_convert_quality
+
+        self.render_cache = render_cache
+        self.render_cache_folder = ".autogpy_render_cache"
+        self.render_cache_size = 8
+
+        # resolution at which series are decimated, see `plot(..., decimate = ...)`
+        self.decimation_dpi = 300
+
+        self.use_gnuplot_session = gnuplot_session
+
+        if preview_mode not in ("latex", "cairo"):
+            raise ValueError("preview_mode '%s' not supported. Use 'latex' or 'cairo'." % preview_mode)
+        self.preview_mode = preview_mode
         
         self.pdflatex_terminal_parameters = {
             "x_size" : "9.9cm"
@@ -181,20 +293,149 @@ class AutoGnuplotFigure(object):
 
         self._allow_strings = allow_strings 
 
-        # initializes the Makefile and the autosync script
-        with open( self.globalize_fname("Makefile"), "w" ) as f:
-            f.write(  autognuplot_terms.MAKEFILE_LATEX.format(
-                **self.__Makefile_replacement_dict
-            )  )
-
-        with open( self.globalize_fname("sync_me.sh"), "w" ) as f:
-            f.write(  autognuplot_terms.SYNC_sc_template.format(
-                SYNC_SCP_CALL = self.__scp_string_nofolder
-            )
-            )
+        # the Makefile and the autosync script are written by `generate_gnuplot_file`
 
         self.is_anonymous = anonymous
 
+    def globalize_fname(self, fname):
+        """path of `fname`, relative to the figure folder, from the current folder."""
+        return self.folder_name + '/' + fname
+
+    def __getstate__(self):
+        """Pickling support, e.g. to render in a process pool. Waits for the deferred dataset
+        writes (see `wait_dataset_writes`): datasets are carried by reference to their files,
+        hence the receiving process must see the same file system and working folder.
+        """
+        self.wait_dataset_writes()
+        state = self.__dict__.copy()
+        state['_AutoGnuplotFigure__pending_writes'] = []
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+
+    def get_spec(self, relative_to = "."):
+        """Specification of the figure as a JSON-serializable dict, see `save_spec`.
+        Paths are relative to the folder `relative_to`.
+        """
+        store = self.dataset_store
+        return OrderedDict([
+            ('autogpy_spec', SPEC_VERSION)
+            , ('folder_name', os.path.relpath(self.folder_name, relative_to))
+            , ('file_identifier', self.file_identifier)
+            , ('options', OrderedDict([
+                ('verbose', self.verbose)
+                , ('autoescape', self._autoescape)
+                , ('latex_enabled', self.terminals_enabled_by_default['latex']['is_enabled'])
+                , ('tikz_enabled', self.terminals_enabled_by_default['tikz']['is_enabled'])
+                , ('allow_strings', self._allow_strings)
+                , ('hostname', self.__hostname)
+                , ('jpg_convert_density', self.pdflatex_jpg_convert_density)
+                , ('jpg_convert_quality', self.pdflatex_jpg_convert_quality)
+                , ('anonymous', self.is_anonymous)
+                , ('data_format', self.data_format)
+                , ('compress', self.compress)
+                , ('data_storage', self.data_storage)
+                , ('dataset_store', None if store is None else os.path.relpath(store.root, relative_to))
+                , ('deferred_writes', self.deferred_writes)
+                , ('render_cache', self.render_cache)
+                , ('gnuplot_session', self.use_gnuplot_session)
+                , ('preview_mode', self.preview_mode)]))
+            , ('pdflatex_terminal_parameters', self.pdflatex_terminal_parameters)
+            , ('decimation_dpi', self.decimation_dpi)
+            , ('variables', self.variables)
+            , ('global_plotting_parameters', self.global_plotting_parameters)
+            , ('alter_multiplot_state', self.alter_multiplot_state)
+            , ('datasets_to_plot', self.datasets_to_plot)
+            , ('is_multiplot', self.is_multiplot)
+            , ('multiplot_index', self.multiplot_index)
+            , ('dataset_counter', self.__dataset_counter)
+            , ('datablocks', self.__datablocks)
+            , ('inplace_datasets', sorted(self.__inplace_datasets))
+        ])
+
+    def save_spec(self, path = None):
+        """Saves the specification of the figure (variables, parameters, multiplot state, datasets and terminal parameters)
+        as compact JSON. Datasets are referred to by their files, hence the figure can be reloaded (`load_spec`), restyled and
+        rendered without recomputing its data. Waits for the deferred dataset writes.
+
+        Parameters
+        ----------------
+        path: str, optional
+             (None) JSON file, by default `<file_identifier>__.spec.json` in the figure folder. Paths are stored relative to it.
+
+        Returns
+        ----------------
+        path of the specification.
+        """
+        import json
+
+        self.wait_dataset_writes()
+        if path is None:
+            path = self.globalize_fname(self.file_identifier + "__.spec.json")
+
+        plot_helpers.write_if_changed(
+            path
+            , json.dumps(self.get_spec(os.path.dirname(path) or "."), separators = (",", ":")))
+        return path
+
+    @classmethod
+    def load_spec(cls, path, **kw):
+        """Recreates a figure saved by `save_spec`.
+
+        Parameters
+        ----------------
+        path: str
+             JSON file written by `save_spec`.
+        **kw:
+             override the constructor options stored in the specification (e.g. `verbose = True`).
+
+        Returns
+        ----------------
+        fig : AutoGnuplotFigure
+
+        Examples
+        ----------------
+        >>> fig.save_spec() # e.g. at the end of a long analysis
+        >>> fig = autogpy.Figure.load_spec("my_fig/fig__.spec.json")
+        >>> fig.set("xrange [0:10]")
+        >>> fig.jupyter_show_pdflatex()
+        """
+        import json
+
+        with open(path) as f:
+            spec = json.load(f, object_pairs_hook = OrderedDict)
+        if spec.get('autogpy_spec') != SPEC_VERSION:
+            raise ValueError("%s is not a figure specification (version %s expected)." % (path, SPEC_VERSION))
+
+        spec_folder = os.path.dirname(path)
+        options = spec['options']
+        if options['dataset_store'] is not None:
+            options['dataset_store'] = os.path.normpath(os.path.join(spec_folder, options['dataset_store']))
+        options.update(kw)
+
+        fig = cls(os.path.normpath(os.path.join(spec_folder, spec['folder_name']))
+                  , spec['file_identifier']
+                  , **options)
+
+        fig.pdflatex_terminal_parameters = spec['pdflatex_terminal_parameters']
+        fig.decimation_dpi = spec['decimation_dpi']
+        fig.variables = spec['variables']
+        fig.global_plotting_parameters = spec['global_plotting_parameters']
+        fig.alter_multiplot_state = spec['alter_multiplot_state']
+        fig.datasets_to_plot = spec['datasets_to_plot']
+        fig.is_multiplot = spec['is_multiplot']
+        fig.multiplot_index = spec['multiplot_index']
+        fig.__dataset_counter = spec['dataset_counter']
+        fig.__datablocks = spec['datablocks']
+        fig.__inplace_datasets = set(spec['inplace_datasets'])
+
+        missing = [x for x in fig.__get_dataset_fnames() if not os.path.exists(fig.globalize_fname(x))]
+        if missing:
+            warnings.warn("datasets of %s not found: %s" % (path, ", ".join(missing)))
+
+        return fig
+
     def set_figure_size(self,x_size=None, y_size=None, **kw):
         """Sets the terminal figure size and possibly more terminal parameters (string expected).
         """
@@ -428,7 +669,9 @@ class AutoGnuplotFigure(object):
         try:
             from IPython.display import display, HTML
             get_ipython
-            if self.terminals_enabled_by_default['tikz']['is_enabled']:
+            if self.preview_mode == "cairo":
+                self.jupyter_show_fast()
+            elif self.terminals_enabled_by_default['tikz']['is_enabled']:
                 self.jupyter_show_tikz()
             else:
                 self.jupyter_show_pdflatex()
@@ -601,7 +844,137 @@ class AutoGnuplotFigure(object):
 
     def __append_to_multiplot_current_dataset(self, x):
         self.datasets_to_plot[self.multiplot_index].append(x)
-    
+
+    def __next_dataset_fname(self, fname_specs, data_format, compress = None):
+        """name (local to the figure folder) of the next dataset file.
+        """
+        if dataset_io.is_binary_format(data_format):
+            template = self.binary_datasetstring_template
+        else:
+            template = self.datasetstring_template
+
+        return self.file_identifier + template.format(
+            DS_ID = self.__dataset_counter
+            , SPECS = fname_specs) + compression.extension(compress)
+
+    def __dump_dataset(self, fname_specs, args, data_format, compress = None):
+        """writes the dataset columns in `args`, recording the time and size in `render_stats`.
+
+        Returns the dataset file name, relative to the figure folder, and
+        the string which replaces `"{DS_FNAME}"` in the gnuplot command template.
+        """
+        dataset_io.check_write_options(data_format, compress)
+        args = dataset_io.resolve_array_inputs(args)
+
+        if self.deferred_writes:
+            return self.__dump_dataset_deferred(fname_specs, args, data_format, compress)
+
+        t0 = time.perf_counter()
+        dataset_fname, ds_source, storage = self.__write_dataset(fname_specs, args, data_format, compress)
+        self.__record_dataset_stats(dataset_fname, storage, dataset_io.columns_shape(args)
+                                    , time.perf_counter() - t0)
+
+        return dataset_fname, ds_source
+
+    def __dump_dataset_deferred(self, fname_specs, args, data_format, compress):
+        """as `__dump_dataset`, but files are written by the shared thread pool.
+        The names are decided right away, the writes are awaited by `wait_dataset_writes`.
+        """
+        inplace = dataset_io.inplace_binary_source(args) if compress is None else None
+        if inplace is not None or (self.__can_inline(data_format, compress)
+                                   and dataset_io.estimate_text_size(args) <= self.inline_max_bytes):
+            # nothing to write in background
+            t0 = time.perf_counter()
+            dataset_fname, ds_source, storage = self.__write_dataset(fname_specs, args, data_format, compress)
+            self.__record_dataset_stats(dataset_fname, storage, dataset_io.columns_shape(args)
+                                        , time.perf_counter() - t0)
+            return dataset_fname, ds_source
+
+        args = dataset_io.snapshot(args)
+        if self.dataset_store is not None:
+            digest = self.dataset_store.digest(args, data_format, compress)
+            dataset_path = self.dataset_store.path(digest, data_format, compress)
+            dataset_fname = os.path.relpath(dataset_path, self.folder_name)
+            storage = "store"
+            write = lambda : self.dataset_store.store(args, data_format, compress, digest = digest)
+        else:
+            dataset_fname = self.__next_dataset_fname(fname_specs, data_format, compress)
+            storage = "file"
+            write = lambda : dataset_io.write_dataset_if_changed(
+                self.globalize_fname(dataset_fname)
+                , lambda fname : dataset_io.write_dataset(fname, args, data_format, compress))
+
+        shape = dataset_io.columns_shape(args)
+
+        def timed_write():
+            t0 = time.perf_counter()
+            write()
+            self.__record_dataset_stats(dataset_fname, storage, shape, time.perf_counter() - t0)
+
+        future = dataset_io.get_write_executor().submit(timed_write)
+        self.__pending_writes.append((dataset_fname, future))
+
+        return dataset_fname, dataset_io.dataset_source(args, data_format, compress)
+
+    def wait_dataset_writes(self):
+        """Waits for the dataset writes deferred by `deferred_writes = True`. Called by `generate_gnuplot_file`.
+
+        Raises
+        ----------------
+        dataset_io.DatasetWriteError
+             if any write failed. The message names the datasets involved.
+        """
+        pending, self.__pending_writes = self.__pending_writes, []
+        dataset_io.wait_writes(pending)
+
+    def __write_dataset(self, fname_specs, args, data_format, compress):
+        """see `__dump_dataset`. Additionally returns the storage kind used (see `render_stats.RenderStats`)."""
+        inplace = dataset_io.inplace_binary_source(args) if compress is None else None
+        if inplace is not None:
+            # binary compatible memory-mapped array: no copy
+            dataset_path, binary_clause = inplace
+            dataset_fname = os.path.relpath(dataset_path, self.folder_name)
+            self.__inplace_datasets.add(dataset_fname)
+            return dataset_fname, '"{DS_FNAME}" ' + binary_clause, "inplace"
+
+        if self.__can_inline(data_format, compress) \
+           and dataset_io.estimate_text_size(args) <= self.inline_max_bytes:
+            return self.__add_datablock(dataset_io.format_text(args)), '{DS_FNAME}', "inline"
+
+        if self.dataset_store is not None:
+            dataset_path = self.dataset_store.store(args, data_format, compress)
+            dataset_fname = os.path.relpath(dataset_path, self.folder_name)
+            storage = "store"
+        else:
+            dataset_fname = self.__next_dataset_fname(fname_specs, data_format, compress)
+            dataset_io.write_dataset_if_changed(
+                self.globalize_fname(dataset_fname)
+                , lambda fname : dataset_io.write_dataset(fname, args, data_format, compress))
+            storage = "file"
+
+        return dataset_fname, dataset_io.dataset_source(args, data_format, compress), storage
+
+    def __record_dataset_stats(self, dataset_fname, storage, shape, seconds):
+        if storage == "inline":
+            n_bytes = len(self.__datablocks[dataset_fname])
+        elif storage == "inplace":
+            n_bytes = 0
+        else:
+            n_bytes = os.path.getsize(self.globalize_fname(dataset_fname))
+        self.render_stats.add_dataset(dataset_fname, storage, shape[0], shape[1], n_bytes, seconds)
+
+
+    def __can_inline(self, data_format, compress):
+        return self.data_storage == "inline" \
+            and not dataset_io.is_binary_format(data_format) \
+            and compress is None
+
+    def __add_datablock(self, text):
+        """stores `text` as the datablock of the next dataset and returns its name.
+        """
+        name = "$DATA_%d" % self.__dataset_counter
+        self.__datablocks[name] = text
+        return name
 
     def add_xy_dataset(self
                        , x
@@ -612,21 +985,13 @@ class AutoGnuplotFigure(object):
         """Deprecated: Makes a x-y plot. Use `plot` instead.
         """
 
-        x = np.array(x)
-        y = np.array(y)
-        data = np.concatenate([x[:,np.newaxis] ,y[:,np.newaxis]  ],axis = 1)
-        dataset_fname = self.file_identifier + self.datasetstring_template.format(            
-            DS_ID = self.__dataset_counter
-            , SPECS = fname_specs)
-        
-        np.savetxt( self.globalize_fname(dataset_fname) ,  data)
+        dataset_fname, ds_source = self.__dump_dataset(fname_specs, [x, y], self.data_format, self.compress)
 
-        
         self.__append_to_multiplot_current_dataset(
             {'dataset_fname' : dataset_fname
              , 'plottype' : 'xy'
              , 'gnuplot_opt' : gnuplot_opt
-             , 'gnuplot_command_template' : """ "{DS_FNAME}" u 1:2 {OPTS}  """
+             , 'gnuplot_command_template' : """ {DS_SOURCE} u 1:2 {{OPTS}}  """.format(DS_SOURCE = ds_source)
 
             }
 
@@ -658,9 +1023,11 @@ class AutoGnuplotFigure(object):
                      , normalization = None
                      , kde = False
                      , kde_kw = {}
+                     , kde_method = "exact"
                      , reweight = lambda edges_mid : 1
                      , dump_data = False
                      , compress_dumped_data = True
+                     , dump_data_format = "text"
                      , **kw
                     ):
 
@@ -668,12 +1035,14 @@ class AutoGnuplotFigure(object):
 
         Parameters
         ------------------------
-        x: list, np.array, or other format compatible with np.histogram
-             1D dataset to histogram
+        x: list, np.array, np.memmap, path of a `.npy` file, or iterator of 1D arrays
+             1D dataset to histogram. Samples are counted chunk by chunk in parallel threads (see `histogram.histogram`), 
+             hence they need not fit in memory. Iterators of chunks require explicit bin edges, or `bins` and `range`, in `hist_kw`, 
+             and do not support `kde` and `dump_data`.
         gnuplot_command_no_u: str
              gnuplot `plot` call arguments, skipping the filename and the `usigng` part. Should be used for title, plotstyle, etc.
         hist_kw: dict, optional
-             ({}) arguments to pass to the inner np.histogram call
+             ({}) arguments to pass to the inner `histogram.histogram` call (same as `np.histogram`, plus `chunk_size` and `max_workers`)
         gnuplot_command_using: str, optional
              ("u 1:2") overrides the default `using` part. (default: "using 1:2")
         normalization: float, str, optional
@@ -682,13 +1051,19 @@ class AutoGnuplotFigure(object):
              (False) a gaussian kernel will be used to histogram the data, edges used are from the np.histogram call. 
              Note the number of bins is specified in the hist_kw dict.
         kde_kw: dict, optional
-             ({}) parameters to pass to the `scipy.stats.gaussian_kde` call
+             ({}) parameters to pass to the `scipy.stats.gaussian_kde` call (or to `kde.fft_kde`, see `kde_method`)
+        kde_method: str, optional
+             ("exact") `"exact"` evaluates `scipy.stats.gaussian_kde`, in O(samples x bins). `"fft"` bins the samples on a fine grid and convolves them 
+             via FFT (see `kde.fft_kde`): same bandwidth rules (`bw_method` "scott", "silverman" or scalar), relative error below 1e-3 of the peak density, 
+             and suitable for millions of samples, also memory-mapped.
         reweight: function, optional
              (`lambda: edges_mid : 1`) function to reweight the histogram or kde values. Receives the bin center as parameter.
         dump_data: bool, optional
              (False) dumps the input data as csv
         compress_dumped_data: bool, optional
              (True) the data dumped (by dump_data = True) are gz-compressed.
+        dump_data_format: str, optional
+             ("text") format of the data dumped (by dump_data = True). Pass `"npy"` for a `.npy` file (`compress_dumped_data` is then ignored).
         **kw: optional
              passes through to the inner `p_generic` call.
 
@@ -703,15 +1078,19 @@ class AutoGnuplotFigure(object):
 
         """
 
-        v_, e_ = np.histogram(x,**hist_kw)
+        if kde:
+            autogpy_kde.check_kde_method(kde_method)
+        if isinstance(x, collections.abc.Iterator) and (kde or dump_data):
+            raise ValueError("kde and dump_data require the whole sample: pass an array (possibly memory-mapped) instead of an iterator.")
+        if dataset_io.is_array_file(x):
+            x = dataset_io.load_array_file(x)[0]
+
+        v_, e_ = histogram.histogram(x,**hist_kw)
         edges_mid = .5 * (e_[1:] + e_[:-1])
         
         
         if kde:
-            from scipy.stats import gaussian_kde
-            kernel = gaussian_kde(x,**kde_kw)
-
-            kde_vals = kernel(edges_mid)
+            kde_vals = autogpy_kde.kde(x, edges_mid, kde_method, **kde_kw)
 
             v_ = kde_vals        
             
@@ -732,14 +1111,21 @@ class AutoGnuplotFigure(object):
             if self.verbose:
                 print("Dumping histogram raw data.")
             dataset_fname_hist = plot_out["dataset_fname"]
-            dataset_dump_data = dataset_fname_hist + '.hist_compl_dump.dat' + ( '.gz' if compress_dumped_data else '' )
-            globalized_dataset_dump_data = self.globalize_fname(dataset_dump_data)
+            if dataset_fname_hist.startswith("$"):
+                # inline datablock, the dump is a file anyway
+                dataset_fname_hist = self.file_identifier + "__" + dataset_fname_hist[1:]
+
+            if dump_data_format == "npy":
+                dataset_dump_data = dataset_fname_hist + '.hist_compl_dump.npy'
+                dataset_io.save_npy(self.globalize_fname(dataset_dump_data), [x])
+            else:
+                dataset_dump_data = dataset_fname_hist + '.hist_compl_dump.dat' + ( '.gz' if compress_dumped_data else '' )
+                globalized_dataset_dump_data = self.globalize_fname(dataset_dump_data)
+
+                # block by block, also for memory-mapped samples
+                dataset_io.write_text(globalized_dataset_dump_data, [x]
+                                      , compress = "gz" if compress_dumped_data else None)
 
-            xyzt = [  x[: , np.newaxis ] if len(x.shape) == 1 else x for x in [x] ]                   
-                    
-            data = np.concatenate( xyzt , axis = 1 )
-            np.savetxt( globalized_dataset_dump_data ,  data)
-                    
         return plot_out
 
     def hist_plthist(self
@@ -900,6 +1286,7 @@ class AutoGnuplotFigure(object):
              Alternatively, can be a list or np.array containing data (see *args)
         *args: lists or np.array, optional
              columns with the data, one or more columns can contain strings (e.g. for labels). In this case 'allow_strings' must be True.
+             Paths of `.npy`/`.npz` files and `np.memmap` objects are read without loading them in memory. A single memory-mapped, C-contiguous, little-endian 1D/2D array is referenced in place by gnuplot, via a `binary skip=...` clause and without any copy; other layouts are converted block by block.
         fname_specs: string, optional
              ("") allows to specify a filename for the data different for the default one.
         autoescape: bool, optional
@@ -908,6 +1295,16 @@ class AutoGnuplotFigure(object):
              (False) set to True to allows columns with strings. This requires pandas. Might become True by default in the future.
         column_names: list of strings, optional
              (None) set the names of the columns. Considered only if `allow_strings=True`.
+        data_format: string, optional
+             (as set in by the constructor) storage format of the dataset: `"text"`, `"binary"` (float64), `"binary32"`.
+        compress: string, optional
+             (as set in by the constructor) compression of the text dataset: `None`, `"gz"`, `"zstd"` or `"lz4"`.
+        decimate: string, optional
+             (None) reduces long line series to what the figure can show: `"minmax"` keeps the min and max of each pixel column, `"lttb"` applies the Largest-Triangle-Three-Buckets algorithm. 
+             The number of pixels follows from `pdflatex_terminal_parameters["x_size"]` at `decimation_dpi` (300). Axes in logscale (via `set`) are decimated in log space. 
+             Requires explicit, sorted, x values as first column; all the columns are decimated alike.
+        decimate_points: int, optional
+             (None) overrides the number of pixels used by `decimate`.
         `for_`: string, optional
              (None) allows to use the `for` gnuplot keyword.
         label: string, optional
@@ -923,6 +1320,10 @@ class AutoGnuplotFigure(object):
         autoescape = kw.get("autoescape",self._autoescape)
         allow_strings = kw.get("allow_strings",self._allow_strings)
         column_names = kw.get("column_names",None)
+        data_format = kw.get("data_format",self.data_format)
+        compress = kw.get("compress",self.compress)
+        decimate = kw.get("decimate",None)
+        decimate_points = kw.get("decimate_points",None)
         for_enabled = kw.get("for_",None)        
         if for_enabled is not None:
             allow_strings = False
@@ -946,12 +1347,14 @@ class AutoGnuplotFigure(object):
 
         ## the following keywords are not blindly appended to the command line
         kw_reserved = ["fname_specs", "autoescape", "allow_strings"
-                       , "column_names", "for_", "label"
+                       , "column_names", "data_format", "compress", "decimate", "decimate_points"
+                       , "for_", "label"
                        , "t", "ti", "tit", "titl", "title"]
 
 
         ### allowing to plot even without the command_line arg
-        if not isinstance(command_line, str): # \
+        if not isinstance(command_line, str) \
+           or (dataset_io.is_array_file(command_line) and os.path.isfile(command_line)): # \
            #or isinstance(command_line, np.ndarray):
             #prepending 'command_line', which should now contain data
 
@@ -961,7 +1364,7 @@ class AutoGnuplotFigure(object):
         # autosupport for pandas series
         if pandas_support_enabled:
             if len(args) == 1: #pd.core.series.Series
-                if isinstance(args[0],pandas.core.series.Series):
+                if _is_pandas_series(args[0]):
                     series = args[0]
                     args = series.index, series.values
                     if not title_kw_provided:
@@ -994,11 +1397,21 @@ class AutoGnuplotFigure(object):
             )            
         else:
 
-            dataset_fname = self.file_identifier + self.datasetstring_template.format(            
-                DS_ID = self.__dataset_counter
-                , SPECS = fname_specs)
+            args = dataset_io.resolve_array_inputs(args)
+
+            if decimate is not None:
+                args = self.__decimate(args, decimate, decimate_points)
+
+            dataset_io.check_write_options(data_format, compress)
+            if allow_strings and dataset_io.is_binary_format(data_format):
+                raise ValueError("data_format '%s' does not support string columns (allow_strings=True)." % data_format)
+
+            dataset_fname = self.__next_dataset_fname(fname_specs, data_format, compress)
+            # titles are guessed from the per-figure name, also for stored datasets
+            title_fname = dataset_fname
 
             globalized_dataset_fname = self.globalize_fname(dataset_fname)
+            ds_source = dataset_io.dataset_source(args, data_format, compress)
 
             if allow_strings and pandas_support_enabled:
                 # pandas way. need to import
@@ -1006,16 +1419,35 @@ class AutoGnuplotFigure(object):
                 if column_names is None:
                     column_names = ["col_%02d" % x for x in range(len(args))]
                     
+                t0 = time.perf_counter()
                 xyzt = pd.DataFrame(
                     {
                         n : v
                         for n,v in zip(column_names, args)
                     }
                 )
-                xyzt.to_csv(globalized_dataset_fname
-                            , sep = " "
-                            , header = False
-                            , index = False)
+                csv_text = None
+                if self.__can_inline(data_format, compress):
+                    csv_text = xyzt.to_csv(sep = " ", header = False, index = False)
+                if csv_text is not None and len(csv_text) <= self.inline_max_bytes:
+                    dataset_fname = self.__add_datablock(csv_text)
+                    ds_source = '{DS_FNAME}'
+                elif compress is not None:
+                    writer = lambda fname : compression.write_compressed(
+                        fname
+                        , [xyzt.to_csv(sep = " ", header = False, index = False).encode()]
+                        , compress)
+                else:
+                    writer = lambda fname : xyzt.to_csv(fname
+                                                        , sep = " "
+                                                        , header = False
+                                                        , index = False)
+                if not dataset_fname.startswith("$"):
+                    dataset_io.write_dataset_if_changed(globalized_dataset_fname, writer)
+                self.__record_dataset_stats(dataset_fname
+                                            , "inline" if dataset_fname.startswith("$") else "file"
+                                            , xyzt.shape
+                                            , time.perf_counter() - t0)
                 if self.verbose:
                     print(xyzt)
 
@@ -1023,12 +1455,7 @@ class AutoGnuplotFigure(object):
             else:
                 # numpy way
                 try:
-                    xyzt = list(map( lambda x : np.array(x), args  ))
-                    ## adding second dimension if needed, this is a feature to allow a for loop
-                    xyzt = [  x[: , np.newaxis ] if len(x.shape) == 1 else x for x in xyzt]                   
-                    
-                    data = np.concatenate( xyzt , axis = 1 )
-                    np.savetxt( globalized_dataset_fname ,  data)
+                    dataset_fname, ds_source = self.__dump_dataset(fname_specs, args, data_format, compress)
                 except TypeError:
                     print("\nWARNING: You got this exception likely beacuse you have columns with strings.\n"
                           "Please set 'allow_strings' to True.")
@@ -1039,7 +1466,9 @@ class AutoGnuplotFigure(object):
                     print('[%s] Warning: "{DS_FNAME}" will be prepended to your string' % command_line)
                 command_line = for_prepend + ' "{DS_FNAME}"' + " " + command_line
 
-            kw_expansion_ret = self.__p_generic_kw_expansion(command_line,dataset_fname,kw_reserved,kw)            
+            command_line = command_line.replace('"{DS_FNAME}"', ds_source)
+
+            kw_expansion_ret = self.__p_generic_kw_expansion(command_line,title_fname,kw_reserved,kw)
 
             command_line = kw_expansion_ret['command_line']
 
@@ -1058,6 +1487,34 @@ class AutoGnuplotFigure(object):
 
         return to_append
 
+    def __decimate(self, args, method, n_pixels = None):
+        """decimates the columns in `args` (the first being x, the second y) via `decimation.decimation_indices`.
+        """
+        columns = [np.asarray(x) for x in args]
+        if len(columns) < 2 or any(c.ndim != 1 for c in columns):
+            raise ValueError("decimate requires x and y (and possibly more) 1D columns.")
+
+        x, y = columns[0], columns[1]
+        if not np.all(x[1:] >= x[:-1]):
+            warnings.warn("decimate requires sorted x values; the dataset is not decimated.")
+            return args
+
+        if n_pixels is None:
+            n_pixels = plot_helpers.terminal_size_to_pixels(self.pdflatex_terminal_parameters["x_size"]
+                                                             , self.decimation_dpi)
+
+        log_axes = plot_helpers.logscale_axes(
+            self.global_plotting_parameters
+            + sum(self.alter_multiplot_state[:self.multiplot_index + 1], []))
+
+        indices = decimation.decimation_indices(x, y, method, n_pixels
+                                                , logx = "x" in log_axes
+                                                , logy = "y" in log_axes)
+        if self.verbose:
+            print("decimation (%s): %d -> %d samples" % (method, len(x), len(indices)))
+
+        return [c[indices] for c in columns]
+
     def get_txt_dataset(self,ds_path):
         """loads a txt dataset (proxies `np.loadtxt`)
         """
@@ -1095,6 +1552,11 @@ class AutoGnuplotFigure(object):
              (False) if `True`, the inferred parameter names are renamed to be unique. 
              Experimental and buggy!
 
+        data_format: str
+             (as set in by the constructor) storage format of the dataset (see `plot`).
+
+        compress: str
+             (as set in by the constructor) compression of the dataset (see `plot`).
 
         Examples
         ----------------------------
@@ -1199,25 +1661,14 @@ class AutoGnuplotFigure(object):
             #           "(,[a-zA-z][a-zA-z0-9_]*?)*\)=(.*)", )
 
 
-        dataset_fname = self.file_identifier + self.datasetstring_template.format(            
-                DS_ID = self.__dataset_counter
-                , SPECS = "fit")
-
-        globalized_dataset_fname = self.globalize_fname(dataset_fname)
+        data_format = kw.get("data_format", self.data_format)
+        compress = kw.get("compress", self.compress)
+        dataset_fname, ds_source = self.__dump_dataset("fit", args, data_format, compress)
 
-        # this part needs to be refactored outputs
-        xyzt = list(map( lambda x : np.array(x), args  ))
-        # adding second dimension if needed, this is a feature to allow a for loop
-        xyzt = [  x[: , np.newaxis ] if len(x.shape) == 1 else x for x in xyzt]                   
-        
-        data = np.concatenate( xyzt , axis = 1 )
-        np.savetxt( globalized_dataset_fname ,  data)
-        
-        
         to_append = {"dataset_fname" : dataset_fname
                      , "plottype" : "gnuplotfit"
                      , "gnuplot_opt" : ""
-                     , 'gnuplot_command_template' : '{FOO} "{{DS_FNAME}}" {MODS}'.format(FOO = foo, MODS=modifiers) }
+                     , 'gnuplot_command_template' : '{FOO} {DS_SOURCE} {MODS}'.format(FOO = foo, DS_SOURCE = ds_source, MODS=modifiers) }
         
         self.__append_to_multiplot_current_dataset(
                 to_append
@@ -1227,11 +1678,19 @@ class AutoGnuplotFigure(object):
 
     def fplot(self,foo,xsampling=None,
               xsampling_N=100,
+              adaptive=False,
+              adaptive_tol=1e-3,
+              adaptive_max_points=10000,
+              n_jobs=None,
               **kw):
         """Mimicks matlab fplot function. 
 
         Matlab ref: https://www.mathworks.com/help/matlab/ref/fplot.html
 
+        `foo` is first called once on the whole array of samples; if this fails
+        (or does not return one value per sample) it is called sample by sample,
+        possibly in a process pool (see `sampling.evaluate`).
+
         Parameters
         ----------------
         foo: scalar function
@@ -1240,6 +1699,18 @@ class AutoGnuplotFigure(object):
         xsampling: iterable, optional
             (`np.linspace(-5,5)`) contains the x samples on which foo is evaluated.
 
+        adaptive: bool, optional
+            (False) refines the sampling where the curve bends, starting from `xsampling` (see `sampling.adaptive_sampling`).
+
+        adaptive_tol: float, optional
+            (1e-3) maximum distance, as a fraction of the curve extent, of each sample from the chord of its neighbours.
+
+        adaptive_max_points: int, optional
+            (10000) maximum number of samples in adaptive mode.
+
+        n_jobs: int, optional
+            (None) processes evaluating a non-vectorized `foo`. If None, a pool is used for slow, picklable functions. Functions that cannot be sent to the workers (e.g. lambdas) are evaluated serially, with a warning.
+
         **kw: same as in `plot`        
         """
 
@@ -1248,7 +1719,13 @@ class AutoGnuplotFigure(object):
         elif isinstance(xsampling,tuple):
             xsampling = np.linspace(xsampling[0],xsampling[1],xsampling_N)
 
-        yval = [foo(x) for x in xsampling]
+        if adaptive:
+            xsampling, yval = sampling.adaptive_sampling(foo, xsampling
+                                                         , tol = adaptive_tol
+                                                         , max_points = adaptive_max_points
+                                                         , n_jobs = n_jobs)
+        else:
+            yval = sampling.evaluate(foo, xsampling, n_jobs = n_jobs)
 
         return self.plot(xsampling,yval,**kw)
 
@@ -1269,18 +1746,28 @@ class AutoGnuplotFigure(object):
         self.variables[name] = '"%s"'%str(value) if is_string else str(value)
         
 
-    def __render_variables(self):
+    def __render_variables(self, overrides = None):
+        """variable declarations. `overrides` replaces or extends `variables`.
+        """
+        variables = self.variables
+        if overrides:
+            variables = OrderedDict(variables)
+            variables.update(overrides)
 
         return "\n".join(
-            [ "{NAME}={VALUE}".format(NAME = k, VALUE=v) for (k,v) in self.variables.items()    ]
+            [ "{NAME}={VALUE}".format(NAME = k, VALUE=v) for (k,v) in variables.items()    ]
         )
         
         
-    def __generate_gnuplot_plotting_calls(self):
+    def __generate_gnuplot_plotting_calls(self, datasets_to_plot = None):
+        """fit and plot calls, of `datasets_to_plot` if given (same structure as the attribute).
+        """
+        if datasets_to_plot is None:
+            datasets_to_plot = self.datasets_to_plot
         calls = []
         mp_count = 0
         for alterations, datasets in zip(self.alter_multiplot_state
-                                        , self.datasets_to_plot):
+                                        , datasets_to_plot):
             
             alterations_t = "\n".join( ["\n# this is multiplot idx: %d" % mp_count] + alterations + [""])
 
@@ -1308,16 +1795,32 @@ class AutoGnuplotFigure(object):
         return "\n".join(calls)
 
     def __generate_gnuplot_file_content(self):
+        t0 = time.perf_counter()
         redended_variables = self.__render_variables()
         parameters_string = "\n".join(self.global_plotting_parameters) + "\n"        
 
 
         plotting_string = self.__generate_gnuplot_plotting_calls()
 
-        final_content = "\n".join([ redended_variables ,  parameters_string , plotting_string ])
+        if self.__datablocks:
+            datablocks_string = "".join([dataset_io.gnuplot_datablock(name, text)
+                                         for name, text in self.__datablocks.items()])
+            final_content = "\n".join([ redended_variables , datablocks_string , parameters_string , plotting_string ])
+        else:
+            final_content = "\n".join([ redended_variables ,  parameters_string , plotting_string ])
+
+        self.render_stats.set_script(len(final_content.encode()), time.perf_counter() - t0)
 
         return final_content
 
+    def _generate_template_body(self, datasets_to_plot, variables = None):
+        """core script plotting `datasets_to_plot` in place of the figure datasets, without datablocks.
+        `variables` replaces or extends the declared variables. Used by `figure_template.FigureTemplate`.
+        """
+        return "\n".join([ self.__render_variables(variables)
+                           , "\n".join(self.global_plotting_parameters) + "\n"
+                           , self.__generate_gnuplot_plotting_calls(datasets_to_plot) ])
+
     def print_gnuplot_file_content(self, highlight = True, linenos = 'inline'):
         """Displays the content of the gnuplot file generated. Intended for debug.
 
@@ -1372,17 +1875,32 @@ class AutoGnuplotFigure(object):
 
     def generate_gnuplot_file(self):
         """Generates the final gnuplot scripts without creating any figure. Includes: `Makefile`, `.gitignore` and synchronization scripts.
+
+        Files whose content is unchanged are not rewritten, hence `make` only rebuilds figures whose scripts or datasets changed.
+        Waits for the deferred dataset writes, if any (see `wait_dataset_writes`).
         """
 
+        self.wait_dataset_writes()
+
         final_content = self.__generate_gnuplot_file_content()
 
         ### CORE FILE
         self.__core_gnuplot_file = self.global_file_identifier + "__.core.gnu"
         self.__local_core_gnuplot_file = self.file_identifier + "__.core.gnu"
         
-        with open( self.__core_gnuplot_file  , 'w'  ) as f:            
-            f.write(final_content)
+        plot_helpers.write_if_changed(self.__core_gnuplot_file, final_content)
 
+        #### Makefile and autosync script, shared by the figures of the folder
+        plot_helpers.write_if_changed(
+            self.globalize_fname("Makefile")
+            , autognuplot_terms.MAKEFILE_LATEX.format(**self.__Makefile_replacement_dict)
+        )
+
+        plot_helpers.write_if_changed(
+            self.globalize_fname("sync_me.sh")
+            , autognuplot_terms.SYNC_sc_template.format(
+                SYNC_SCP_CALL = self.__scp_string_nofolder)
+        )
         
         ### JPG terminal
         self.__local_jpg_gnuplot_file = self.file_identifier + "__.jpg.gnu"
@@ -1392,19 +1910,19 @@ class AutoGnuplotFigure(object):
         self.__local_jpg_output  = self.file_identifier + "__.jpg"
         self.__jpg_output = self.globalize_fname(self.__local_jpg_output)
         
-        with open( self.__jpg_gnuplot_file , 'w' ) as f:
-            f.write(
-                autognuplot_terms.JPG_wrapper_file.format(
-                    OUTFILE = self.__local_jpg_output
-                     , CORE =   self.__local_core_gnuplot_file   )
-                )
+        plot_helpers.write_if_changed(
+            self.__jpg_gnuplot_file
+            , autognuplot_terms.JPG_wrapper_file.format(
+                OUTFILE = self.__local_jpg_output
+                , CORE =   self.__local_core_gnuplot_file   )
+        )
 
         #### gitignore
         self.__gitignore_file = self.globalize_fname(".gitignore")
-        with open( self.__gitignore_file, 'w' ) as f:
-            f.write(
-                autognuplot_terms.GITIGNORE_wrapper_file                
-            )
+        plot_helpers.write_if_changed(
+            self.__gitignore_file
+            , autognuplot_terms.GITIGNORE_wrapper_file
+        )
         
         
         #### pdflatex terminal
@@ -1422,27 +1940,53 @@ class AutoGnuplotFigure(object):
         self.__local_pdflatex_compilesh_gnuplot_file = self.file_identifier + "__.pdflatex_compile.sh"
         self.__pdflatex_compilesh_gnuplot_file = self.globalize_fname(self.__local_pdflatex_compilesh_gnuplot_file)
         
-        with open( self.__pdflatex_gnuplot_file, 'w'  ) as f:
-            f.write(
-                autognuplot_terms.LATEX_wrapper_file.format(
-                    CORE = self.__local_core_gnuplot_file
-                    , **self.pdflatex_terminal_parameters
-                    )
+        plot_helpers.write_if_changed(
+            self.__pdflatex_gnuplot_file
+            , autognuplot_terms.LATEX_wrapper_file.format(
+                CORE = self.__local_core_gnuplot_file
+                , BUILD_DIR = self.__local_build_dir('pdflatex')
+                , **self.pdflatex_terminal_parameters
             )
+        )
 
-        with open ( self.__pdflatex_compilesh_gnuplot_file , 'w' ) as f:
-            f.write(
-                autognuplot_terms.LATEX_compile_sh_template.format(
-                    LATEX_TARGET_GNU = self.__local_pdflatex_gnuplot_file
-                    , FINAL_PDF_NAME = self.__local_pdflatex_output
-                    , FINAL_PDF_NAME_jpg_convert = self.__local_pdflatex_output_jpg_convert
-                    , pdflatex_jpg_convert_density = self.pdflatex_jpg_convert_density
-                    , pdflatex_jpg_convert_quality = self.pdflatex_jpg_convert_quality
-                )
+        plot_helpers.write_if_changed(
+            self.__pdflatex_compilesh_gnuplot_file
+            , autognuplot_terms.LATEX_compile_sh_template.format(
+                TIMING_PREAMBLE = autognuplot_terms.COMPILE_TIMING_preamble.format(
+                    TIMINGS_FILE = self.__local_timings_file('pdflatex'))
+                , BUILD_DIR = self.__local_build_dir('pdflatex')
+                , LATEX_TARGET_GNU = self.__local_pdflatex_gnuplot_file
+                , FINAL_PDF_NAME = self.__local_pdflatex_output
+                , FINAL_PDF_NAME_jpg_convert = self.__local_pdflatex_output_jpg_convert
+                , pdflatex_jpg_convert_density = self.pdflatex_jpg_convert_density
+                , pdflatex_jpg_convert_quality = self.pdflatex_jpg_convert_quality
             )
+        )
         ## the tikz part is refactored into a dedicated function
         self.__generate_gnuplot_files_tikz()
-        
+
+        self.__generate_gnuplot_files_cairo()
+
+        #### Makefile dependencies on the datasets
+        self.__local_makefile_deps_file = self.file_identifier + "__.deps.mk"
+        plot_helpers.write_if_changed(
+            self.globalize_fname(self.__local_makefile_deps_file)
+            , autognuplot_terms.MAKEFILE_DEPS_template.format(
+                TARGETS = " ".join([self.__local_pdflatex_output, self.__local_tikz_output])
+                , DATASETS = " ".join(self.__get_dataset_fnames())
+            )
+        )
+
+    def __get_dataset_fnames(self):
+        """dataset files (relative to the figure folder) referenced by the figure, without repetitions.
+        """
+        fnames = OrderedDict()
+        for datasets in self.datasets_to_plot:
+            for x in datasets:
+                # datablocks (data_storage = "inline") are not files
+                if x['dataset_fname'] and not x['dataset_fname'].startswith("$"):
+                    fnames[x['dataset_fname']] = None
+        return list(fnames.keys())
 
     def __generate_gnuplot_files_tikz(self):
         self.__local_tikz_output = self.file_identifier + "__.tikz.pdf"
@@ -1458,24 +2002,234 @@ class AutoGnuplotFigure(object):
         self.__local_tikz_compilesh_gnuplot_file = self.file_identifier + "__.tikz_compile.sh"
         self.__tikz_compilesh_gnuplot_file = self.globalize_fname(self.__local_tikz_compilesh_gnuplot_file)
         
-        with open( self.__tikz_gnuplot_file, 'w'  ) as f:
-            f.write(
-                autognuplot_terms.TIKZ_wrapper_file.format(
-                    CORE = self.__local_core_gnuplot_file
-                    , **self.pdflatex_terminal_parameters ## maybetochange?
-                    )
+        plot_helpers.write_if_changed(
+            self.__tikz_gnuplot_file
+            , autognuplot_terms.TIKZ_wrapper_file.format(
+                CORE = self.__local_core_gnuplot_file
+                , BUILD_DIR = self.__local_build_dir('tikz')
+                , **self.pdflatex_terminal_parameters ## maybetochange?
             )
+        )
 
-        with open ( self.__tikz_compilesh_gnuplot_file , 'w' ) as f:
-            f.write(
-                autognuplot_terms.TIKZ_compile_sh_template.format(
-                    TIKZ_TARGET_GNU = self.__local_tikz_gnuplot_file
-                    , FINAL_PDF_NAME = self.__local_tikz_output
-                    , FINAL_PDF_NAME_jpg_convert = self.__local_tikz_output_jpg_convert
-                    , pdflatex_jpg_convert_density = self.pdflatex_jpg_convert_density
-                    , pdflatex_jpg_convert_quality = self.pdflatex_jpg_convert_quality
-                )
+        plot_helpers.write_if_changed(
+            self.__tikz_compilesh_gnuplot_file
+            , autognuplot_terms.TIKZ_compile_sh_template.format(
+                TIMING_PREAMBLE = autognuplot_terms.COMPILE_TIMING_preamble.format(
+                    TIMINGS_FILE = self.__local_timings_file('tikz'))
+                , BUILD_DIR = self.__local_build_dir('tikz')
+                , TIKZ_TARGET_GNU = self.__local_tikz_gnuplot_file
+                , FINAL_PDF_NAME = self.__local_tikz_output
+                , FINAL_PDF_NAME_jpg_convert = self.__local_tikz_output_jpg_convert
+                , pdflatex_jpg_convert_density = self.pdflatex_jpg_convert_density
+                , pdflatex_jpg_convert_quality = self.pdflatex_jpg_convert_quality
             )
+        )
+
+    def __render_cache_key(self, terminal):
+        """hash of everything determining the image rendered by `terminal`.
+        """
+        templates = {
+            'pdflatex' : [autognuplot_terms.LATEX_wrapper_file, autognuplot_terms.LATEX_compile_sh_template]
+            , 'tikz' : [autognuplot_terms.TIKZ_wrapper_file, autognuplot_terms.TIKZ_compile_sh_template]
+        }[terminal]
+
+        h = hashlib.blake2b(digest_size = 16)
+        for part in [terminal] + templates + [
+                self.__generate_gnuplot_file_content()
+                , repr(sorted(self.pdflatex_terminal_parameters.items()))
+                , str(self.pdflatex_jpg_convert_density)
+                , str(self.pdflatex_jpg_convert_quality)]:
+            h.update(part.encode())
+            h.update(b"\0")
+
+        for dataset_fname in self.__get_dataset_fnames():
+            h.update(dataset_fname.encode())
+            dataset_path = self.globalize_fname(dataset_fname)
+            if dataset_fname in self.__inplace_datasets:
+                # possibly huge arrays: their size and modification time stand for the content
+                stat = os.stat(dataset_path)
+                h.update(("%d|%d" % (stat.st_size, stat.st_mtime_ns)).encode())
+            # stored datasets are already named after their content
+            elif self.dataset_store is None or not self.dataset_store.owns(dataset_path):
+                dataset_io.hash_file(dataset_path, h)
+
+        return "{ID}__.{TERM}.{KEY}.png".format(ID = self.file_identifier
+                                                , TERM = terminal
+                                                , KEY = h.hexdigest())
+
+    def __render_cache_files(self, cache_key, terminal):
+        """pairs (cached copy, rendered file) of the render cache entry `cache_key`:
+        the image shown and the final output of `terminal` (e.g. `fig__.pdf`).
+        """
+        cached_image = os.path.join(self.globalize_fname(self.render_cache_folder), cache_key)
+        render_command = self.get_render_command(terminal)
+        output = render_command['output']
+        return [(cached_image, render_command['preview'])
+                , (os.path.splitext(cached_image)[0] + os.path.splitext(output)[1], output)]
+
+    def __render_cache_restore(self, cache_key, terminal):
+        """On a hit, restores the rendered files whose content differs from the cached one (e.g. after
+        `make clean`) and marks the entry as recently used. Returns the cached image, None on a miss.
+        """
+        files = self.__render_cache_files(cache_key, terminal)
+        if not all(os.path.isfile(cached) for cached, _ in files):
+            return None
+        for cached, rendered in files:
+            if not os.path.isfile(rendered) or not filecmp.cmp(cached, rendered, shallow = False):
+                shutil.copyfile(cached, rendered)
+            os.utime(cached)
+        return files[0][0]
+
+    def __render_cache_store(self, cache_key, terminal):
+        """copies the rendered image and output in the render cache, keeping the most
+        recently used `render_cache_size` entries of this figure.
+        """
+        cache_folder = self.globalize_fname(self.render_cache_folder)
+        if not os.path.exists(cache_folder):
+            os.makedirs(cache_folder)
+        for cached, rendered in self.__render_cache_files(cache_key, terminal):
+            shutil.copyfile(rendered, cached)
+
+        # same figure and terminal, grouped by key: the image marks the use of the entry
+        prefix = cache_key.rsplit('.', 2)[0] + '.'
+        entries = sorted([os.path.join(cache_folder, x) for x in os.listdir(cache_folder)
+                          if x.startswith(prefix) and x.endswith(".png")]
+                         , key = os.path.getmtime)
+        stale = set(os.path.splitext(x)[0] for x in entries[:-self.render_cache_size])
+        for x in os.listdir(cache_folder):
+            if os.path.splitext(os.path.join(cache_folder, x))[0] in stale:
+                os.remove(os.path.join(cache_folder, x))
+
+    def get_render_command(self, terminal = "pdflatex"):
+        """Returns the command rendering the figure with a given terminal. Requires a call to `generate_gnuplot_file`.
+
+        Parameters
+        ----------------
+        terminal: str, optional
+             ("pdflatex") one of `"pdflatex"`, `"tikz"`, `"jpg"`, `"pngcairo"` or `"pdfcairo"`.
+
+        Returns
+        ----------------
+        dict with keys `command` (to run from the figure folder), `cwd` (the figure folder), `output` (the final file) and `preview` (the image shown in jupyter).
+        """
+        if terminal == "pdflatex":
+            command = ["bash", self.__local_pdflatex_compilesh_gnuplot_file]
+            output = self.globalize_fname(self.__local_pdflatex_output)
+            preview = self.__pdflatex_output_jpg_convert
+        elif terminal == "tikz":
+            command = ["bash", self.__local_tikz_compilesh_gnuplot_file]
+            output = self.__tikz_output
+            preview = self.__tikz_output_jpg_convert
+        elif terminal == "jpg":
+            command = ["gnuplot", self.__local_jpg_gnuplot_file]
+            output = preview = self.__jpg_output
+        elif terminal == "pngcairo":
+            command = ["gnuplot", self.__local_pngcairo_gnuplot_file]
+            output = preview = self.__pngcairo_output
+        elif terminal == "pdfcairo":
+            command = ["gnuplot", self.__local_pdfcairo_gnuplot_file]
+            output = self.__pdfcairo_output
+            preview = None
+        else:
+            raise ValueError("terminal '%s' not supported." % terminal)
+
+        return {'command' : command
+                , 'cwd' : self.folder_name
+                , 'output' : output
+                , 'preview' : preview
+                , 'timings' : self.globalize_fname(self.__local_timings_file(terminal))
+                              if terminal in ("pdflatex", "tikz") else None}
+
+    def __local_timings_file(self, terminal):
+        """per-tool timestamps written by the compile script of `terminal`."""
+        return self.file_identifier + "__." + terminal + ".timings"
+
+    def __local_build_dir(self, terminal):
+        """folder of the intermediate files of the compile script of `terminal`.
+        Being per figure, figures sharing a folder can be compiled concurrently (e.g. `make -j`).
+        """
+        return self.file_identifier + "__." + terminal + ".build"
+
+    def record_render_stats(self, terminal, wall_time):
+        """records in `render_stats` the wall time of a rendering with `terminal`
+        and the per-tool times written by its compile script. Called after each
+        rendering (`jupyter_show*`, `render_many`); call it after running a
+        compile script by other means.
+        """
+        render_command = self.get_render_command(terminal)
+        tools = {}
+        if render_command.get('timings') is not None:
+            tools = render_stats.parse_timings(render_command['timings'])
+        elif render_command['command'][0] == "gnuplot":
+            tools = {'gnuplot' : wall_time}
+        self.render_stats.add_render(terminal, wall_time, tools)
+
+    async def render_async(self
+                           , terminal = "pdflatex"
+                           , semaphore = None
+                           , return_bytes = False):
+        """Asyncio counterpart of the `jupyter_show*` calls: generates and renders the figure without blocking the event loop.
+        Cancelling the task kills the rendering tools.
+
+        Parameters
+        ----------------
+        terminal: str, optional
+             ("pdflatex") see `get_render_command`.
+        semaphore: asyncio.Semaphore, optional
+             (None) bounds the concurrent renderings, by default at `async_render.MAX_CONCURRENT_RENDERS` per event loop.
+        return_bytes: bool, optional
+             (False) the result carries the content of the rendered file instead of its path.
+
+        Returns
+        ----------------
+        `batch_render.RenderResult`, see `async_render.render_async`.
+
+        Examples
+        ----------------
+        >>> result = await fig.render_async(terminal = "pngcairo", return_bytes = True)
+        """
+        # asyncio is slow to import
+        from . import async_render
+        return await async_render.render_async(self, terminal, semaphore, return_bytes)
+
+    def __generate_gnuplot_files_cairo(self):
+        """wrappers for the cairo terminals, used for fast previews. They keep the size of the latex terminals."""
+        font_size = plot_helpers.terminal_font_size(self.pdflatex_terminal_parameters['font'])
+
+        self.__local_pngcairo_output = self.file_identifier + "__.pngcairo.png"
+        self.__pngcairo_output = self.globalize_fname(self.__local_pngcairo_output)
+        self.__local_pngcairo_gnuplot_file = self.file_identifier + "__.pngcairo.gnu"
+
+        plot_helpers.write_if_changed(
+            self.globalize_fname(self.__local_pngcairo_gnuplot_file)
+            , autognuplot_terms.CAIRO_wrapper_file.format(
+                TERMINAL = "pngcairo"
+                , SIZE = "%d,%d" % tuple(
+                    plot_helpers.terminal_size_to_pixels(self.pdflatex_terminal_parameters[k]
+                                                         , self.pdflatex_jpg_convert_density)
+                    for k in ["x_size", "y_size"])
+                , FONT_SIZE = font_size
+                , linewidth = self.pdflatex_terminal_parameters['linewidth']
+                , OUTFILE = self.__local_pngcairo_output
+                , CORE = self.__local_core_gnuplot_file
+            )
+        )
+
+        self.__local_pdfcairo_output = self.file_identifier + "__.pdfcairo.pdf"
+        self.__pdfcairo_output = self.globalize_fname(self.__local_pdfcairo_output)
+        self.__local_pdfcairo_gnuplot_file = self.file_identifier + "__.pdfcairo.gnu"
+
+        plot_helpers.write_if_changed(
+            self.globalize_fname(self.__local_pdfcairo_gnuplot_file)
+            , autognuplot_terms.CAIRO_wrapper_file.format(
+                TERMINAL = "pdfcairo"
+                , SIZE = "{x_size},{y_size}".format(**self.pdflatex_terminal_parameters)
+                , FONT_SIZE = font_size
+                , linewidth = self.pdflatex_terminal_parameters['linewidth']
+                , OUTFILE = self.__local_pdfcairo_output
+                , CORE = self.__local_core_gnuplot_file
+            )
+        )
 
     def __jupyter_show_generic(self
                                , command_to_call
@@ -1483,28 +2237,23 @@ class AutoGnuplotFigure(object):
                                , show_stderr = True
                                , show_stdout = False
                                , height = None
-                               , width = None):
-        
-        from subprocess import Popen as _Popen, PIPE as _PIPE, call as _call
+                               , width = None
+                               , cache_key = None
+                               , use_session = False
+                               , terminal = None):
+        
+        if cache_key is not None:
+            cached_image = self.__render_cache_restore(cache_key, terminal)
+            if cached_image is not None:
+                if self.verbose:
+                    print ("render cache hit: ", cached_image)
+                from IPython.core.display import Image, display
+                display(Image( cached_image, height=height, width=width  ))
+                return
 
-        if self.verbose:
-            print ("trying call: ", command_to_call)
-            
-        proc = _Popen(command_to_call
-                      , shell=False
-                      , universal_newlines=True
-                      , cwd = self.folder_name
-                      , stdout=_PIPE
-                      , stderr=_PIPE)
-        output, err = proc.communicate()
+        output, err, returncode = self.__run_render_command(command_to_call, use_session, terminal)
 
-        #amending for the fit output
-        was_there_an_error = \
-            "error" in output or\
-            "Error" in output or\
-            "error" in err or\
-            ("Error" in err and not "Standard Error" in err) or\
-            proc.returncode != 0
+        was_there_an_error = _was_there_an_error(output, err, returncode)
         
         if was_there_an_error:
             
@@ -1534,13 +2283,51 @@ class AutoGnuplotFigure(object):
             print ("=== stdout end ===")
 
         if not was_there_an_error:
+            if cache_key is not None:
+                self.__render_cache_store(cache_key, terminal)
+
             from IPython.core.display import Image, display
             display(Image( image_to_display, height=height, width=width  ))
 
     
 
+    def __run_render_command(self, command_to_call, use_session = False, terminal = None):
+        """runs a rendering command from the figure folder. gnuplot calls can go through the gnuplot session.
+        If `terminal` is given, the timings are recorded in `render_stats`.
+
+        Returns stdout, stderr and return code.
+        """
+        t0 = time.perf_counter()
+        output, err, returncode = self.__run_render_command_untimed(command_to_call, use_session)
+        if terminal is not None:
+            self.record_render_stats(terminal, time.perf_counter() - t0)
+        return output, err, returncode
+
+    def __run_render_command_untimed(self, command_to_call, use_session = False):
+        if use_session and command_to_call[0] == "gnuplot":
+            if self.verbose:
+                print ("loading in gnuplot session: ", command_to_call[1])
+            output = gnuplot_session.get_session().load(command_to_call[1]
+                                                        , cwd = self.folder_name)
+            return output, "", 0
+
+        from subprocess import Popen as _Popen, PIPE as _PIPE, call as _call
+
+        if self.verbose:
+            print ("trying call: ", command_to_call)
+
+        proc = _Popen(command_to_call
+                      , shell=False
+                      , universal_newlines=True
+                      , cwd = self.folder_name
+                      , stdout=_PIPE
+                      , stderr=_PIPE)
+        output, err = proc.communicate()
+        return output, err, proc.returncode
+
     def jupyter_show(self                     
-                     , show_stdout = False):
+                     , show_stdout = False
+                     , use_session = None):
         """Generates a figure via the jpg terminal and opens it in jupyter.
         The more advanced `jupyter_show_pdflatex` and `jupyter_show_tikz` are advised. This call is left for debug.
 
@@ -1548,14 +2335,14 @@ class AutoGnuplotFigure(object):
         ----------------
         show_stdout: bool, optional
              (False) outputs `stdout` and `stderr` to screen.
+        use_session: bool, optional
+             (as set by the constructor `gnuplot_session`) renders via the long-lived gnuplot session.
         """
-        from subprocess import Popen as _Popen, PIPE as _PIPE, call as _call
+        use_session = self.use_gnuplot_session if use_session is None else use_session
 
-        if self.verbose:
-            print ("trying call: ", ["gnuplot", self.__jpg_gnuplot_file ])
-
-        proc = _Popen(["gnuplot", self.__local_jpg_gnuplot_file ] , shell=False,  universal_newlines=True, cwd = self.folder_name, stdout=_PIPE, stderr=_PIPE)
-        output, err = proc.communicate()
+        output, err, _ = self.__run_render_command(["gnuplot", self.__local_jpg_gnuplot_file ]
+                                                   , use_session
+                                                   , terminal = "jpg")
 
         if show_stdout:
             print ("===== stderr =====")
@@ -1567,11 +2354,40 @@ class AutoGnuplotFigure(object):
         from IPython.core.display import Image, display
         display(Image( self.__jpg_output  ))
 
+    def jupyter_show_fast(self
+                          , show_stdout = False
+                          , show_stderr = False
+                          , width = None
+                          , height = None
+                          , use_session = None):
+        """Shows a preview rendered by the `pngcairo` terminal in one gnuplot call, skipping the latex toolchain.
+
+        The figure size is taken from `pdflatex_terminal_parameters` (converted in pixels with `jpg_convert_density`). 
+        Latex markup in labels is not interpreted, use `jupyter_show_pdflatex` for the final rendering.
+
+        Parameters
+        ----------------
+        use_session: bool, optional
+             (as set by the constructor `gnuplot_session`) renders via the long-lived gnuplot session.
+        """
+        use_session = self.use_gnuplot_session if use_session is None else use_session
+        self.__jupyter_show_generic(
+            [ "gnuplot", self.__local_pngcairo_gnuplot_file ]
+            , self.__pngcairo_output
+            , height = height
+            , width = width
+            , show_stderr = show_stderr
+            , show_stdout = show_stdout
+            , use_session = use_session
+            , terminal = "pngcairo"
+        )
+
     def jupyter_show_pdflatex(self
                               , show_stdout = False
                               , show_stderr = False
                               , width = None
-                              , height = None ):
+                              , height = None
+                              , use_cache = None ):
 
         """Shows a pdflatex rendering within the current jupyter notebook.
 
@@ -1579,7 +2395,10 @@ class AutoGnuplotFigure(object):
         To work it requires ImageMagick and authorization to render pdf to jpg. 
         Should it fail:
         https://stackoverflow.com/a/52661288
+
+        `use_cache` (default: as set by the constructor `render_cache`) enables the render cache.
         """
+        use_cache = self.render_cache if use_cache is None else use_cache
         self.__jupyter_show_generic(
             [ "bash", self.__local_pdflatex_compilesh_gnuplot_file  ]
             , self.__pdflatex_output_jpg_convert
@@ -1587,13 +2406,16 @@ class AutoGnuplotFigure(object):
             , width = width
             , show_stderr = show_stderr 
             , show_stdout = show_stdout 
+            , cache_key = self.__render_cache_key('pdflatex') if use_cache else None
+            , terminal = "pdflatex"
         )
 
     def jupyter_show_tikz(self
                           , show_stderr = False
                           , show_stdout = False                          
                           , height = None
-                          , width = None):
+                          , width = None
+                          , use_cache = None):
 
         r"""Shows a pdflatex rendering within the current jupyter notebook.
 
@@ -1616,8 +2438,10 @@ class AutoGnuplotFigure(object):
         gp.write("%\\gpsetdashtype{"..dashtype.."}\n")
         end
 
+        `use_cache` (default: as set by the constructor `render_cache`) enables the render cache.
         """      
 
+        use_cache = self.render_cache if use_cache is None else use_cache
         self.__jupyter_show_generic(
             [ "bash", self.__local_tikz_compilesh_gnuplot_file  ]
             , self.__tikz_output_jpg_convert
@@ -1625,6 +2449,8 @@ class AutoGnuplotFigure(object):
             , width = width
             , show_stderr = show_stderr 
             , show_stdout = show_stdout 
+            , cache_key = self.__render_cache_key('tikz') if use_cache else None
+            , terminal = "tikz"
         )
 
         
@@ -1636,10 +2462,9 @@ class AutoGnuplotFigure(object):
         :param hostname: str
         (None) Overrides the default hostname. Use in case the default hostname is unsuitable for scp copies.
         """
-        import socket
-        import getpass
-        hostname = hostname if hostname is not None else socket.gethostname()
-        self.__ssh_string = "{user}@{hostname}:{dir_}".format(user=getpass.getuser()
+        user, default_hostname = _user_and_hostname()
+        hostname = hostname if hostname is not None else default_hostname
+        self.__ssh_string = "{user}@{hostname}:{dir_}".format(user=user
                                                       , hostname=hostname
                                                       , dir_=self.global_dir_whole_path )
 
@@ -27,6 +27,7 @@ tikz:  $(tikz_targets_pdf)
 
 clean:
 {TAB}rm -f *.pdf *.jpg
+{TAB}rm -Rf *.pdflatex.build *.tikz.build
 {TAB}rm -Rf fig.latex.nice
 {TAB}rm -Rf fig.tikz.nice
 
@@ -37,25 +38,67 @@ deepclean:
 sync:
 {TAB}bash sync_me.sh
 
+## per-figure dependencies on the datasets
+-include $(wildcard *.deps.mk)
+
 """ #.format(TAB="\t")
 
+MAKEFILE_DEPS_template=\
+"""
+{TARGETS}: {DATASETS}
+"""
+
+# aggregates the figure folders of a project, see `project.write_project_makefile`
+MAKEFILE_PROJECT=\
+"""
+SHELL:=/bin/bash
+FIGURE_DIRS={FIGURE_DIRS}
+# target built in each figure folder, e.g. `make -j32 TARGET=latex`
+TARGET?=all
+
+all: $(FIGURE_DIRS)
+
+$(FIGURE_DIRS):
+{TAB}$(MAKE) -C $@ $(TARGET)
+
+clean:
+{TAB}for d in $(FIGURE_DIRS); do $(MAKE) -C $$d clean; done
+
+.PHONY: all clean $(FIGURE_DIRS)
+"""
+
 SYNC_sc_template =\
 """
 {SYNC_SCP_CALL}
 """
 
+# per-tool timestamps of the compile scripts, read by `render_stats.parse_timings`
+COMPILE_TIMING_preamble =\
+"""
+: > {TIMINGS_FILE}
+autogpy_stamp () {{ echo "$1 $(date +%s.%N)" >> {TIMINGS_FILE}; }}
+"""
+
 LATEX_compile_sh_template =\
 """
-mkdir -p fig.latex.nice
+rm -Rf {BUILD_DIR}
+mkdir -p {BUILD_DIR}
+{TIMING_PREAMBLE}
+autogpy_stamp gnuplot
 gnuplot {LATEX_TARGET_GNU} || exit 1
 
-latex fig.latex.nice/plot_out.tex
-dvips plot_out.dvi  -o plot_out.ps
-ps2eps --ignoreBB -f plot_out.ps
-ps2pdf plot_out.ps
+autogpy_stamp latex
+latex -interaction=nonstopmode -output-directory={BUILD_DIR} {BUILD_DIR}/plot_out.tex
+autogpy_stamp dvips
+dvips {BUILD_DIR}/plot_out.dvi  -o {BUILD_DIR}/plot_out.ps
+autogpy_stamp ps2eps
+ps2eps --ignoreBB -f {BUILD_DIR}/plot_out.ps
+autogpy_stamp ps2pdf
+ps2pdf {BUILD_DIR}/plot_out.ps {BUILD_DIR}/plot_out.pdf
 
-mv plot_out.pdf {FINAL_PDF_NAME}
+mv {BUILD_DIR}/plot_out.pdf {FINAL_PDF_NAME} || exit 1
 
+autogpy_stamp convert
 if command -v pdftoppm &> /dev/null
 then
 
@@ -77,19 +120,16 @@ else
   echo ""
 fi
 fi
+autogpy_stamp end
 
-rm *.aux || true
-rm *.dvi || true
-rm *.log || true
-rm *.ps || true
-rm -Rf fig.latex.nice || true
+rm -Rf {BUILD_DIR} || true
 """
 
 LATEX_wrapper_file=\
 """
 set terminal epslatex size {x_size},{y_size} color colortext standalone \
      '{font}'  linewidth {linewidth} {other}
-set output 'fig.latex.nice/plot_out.tex'
+set output '{BUILD_DIR}/plot_out.tex'
 
 load "{CORE}"; 
 """
@@ -99,20 +139,25 @@ TIKZ_wrapper_file=\
 """
 set terminal tikz size {x_size},{y_size} color colortext standalone \
      '{font}'  linewidth {linewidth} {other}
-set output 'fig.tikz.nice/tikz_out.tex'
+set output '{BUILD_DIR}/tikz_out.tex'
 
 load "{CORE}"; 
 """
 
 TIKZ_compile_sh_template =\
 """
-mkdir -p fig.tikz.nice
+rm -Rf {BUILD_DIR}
+mkdir -p {BUILD_DIR}
+{TIMING_PREAMBLE}
+autogpy_stamp gnuplot
 gnuplot {TIKZ_TARGET_GNU} || exit 1
 
-pdflatex fig.tikz.nice/tikz_out.tex
+autogpy_stamp pdflatex
+pdflatex -interaction=nonstopmode -output-directory={BUILD_DIR} {BUILD_DIR}/tikz_out.tex
 
-mv tikz_out.pdf {FINAL_PDF_NAME}
+mv {BUILD_DIR}/tikz_out.pdf {FINAL_PDF_NAME} || exit 1
 
+autogpy_stamp convert
 ## check if pdftoppm exists, usually gives better results
 if command -v pdftoppm &> /dev/null
 then
@@ -135,11 +180,35 @@ else
 fi
 
 fi
+autogpy_stamp end
+
+rm -Rf {BUILD_DIR} || true
+"""
+
+
+CAIRO_wrapper_file=\
+"""
+set terminal {TERMINAL} size {SIZE} enhanced color \
+     font ',{FONT_SIZE:g}' linewidth {linewidth}
+set output '{OUTFILE}'
+
+load "{CORE}"; 
+"""
 
 
-rm *.aux || true
-rm *.log || true
-rm -Rf fig.tikz.nice || true
+# all the instances of a `figure_template.FigureTemplate`, rendered in one gnuplot call
+TEMPLATE_wrapper_file=\
+"""
+set terminal {TERMINAL} size {SIZE} enhanced color \
+     font ',{FONT_SIZE:g}' linewidth {linewidth}
+{ARRAYS}
+do for [AUTOGPY_I=0:{LAST}] {{
+reset
+set output sprintf("{OUTFILE_PATTERN}", AUTOGPY_I)
+{BODY}
+{UNSET_MULTIPLOT}
+unset output
+}}
 """
 
 
@@ -161,8 +230,12 @@ GITIGNORE_wrapper_file=\
 *.tex
 **/fig.latex.nice/**
 **/fig.tikz.nice/**
+*.build/
 *converted*
 plot_out.eps
+.autogpy_render_cache/
+*.pngcairo.png
+*.timings
 """
 
 
@@ -0,0 +1,118 @@
+"""
+This file is part of Autognuplotpy, autogpy.
+
+Concurrent rendering of many figures.
+"""
+import os
+import time
+import traceback
+from collections import namedtuple, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from subprocess import Popen as _Popen, PIPE as _PIPE
+
+from .autognuplot import _was_there_an_error
+
+
+RenderResult = namedtuple("RenderResult"
+                          , ["figure", "terminal", "status", "returncode"
+                             , "stdout", "stderr", "output", "timings"])
+RenderResult.__doc__ = """Outcome of the rendering of one figure.
+
+`status` is `"ok"` or `"error"`. If the generation of the scripts failed, `returncode` and `output` are None and `stderr` holds the traceback. `timings` maps the steps (`generate`, `render`, and the tools of the compile script, see `render_stats`) to their wall time in seconds.
+"""
+
+
+def _render_result(figure, terminal, render_command, generate_time, render_time, output, err, returncode):
+    """records the render statistics of `figure` and builds its `RenderResult`."""
+    figure.record_render_stats(terminal, render_time)
+    timings = OrderedDict([('generate', generate_time), ('render', render_time)])
+    timings.update(figure.render_stats.renders[terminal]['tools'])
+
+    was_there_an_error = _was_there_an_error(output, err, returncode)
+
+    return RenderResult(figure = figure
+                        , terminal = terminal
+                        , status = "error" if was_there_an_error else "ok"
+                        , returncode = returncode
+                        , stdout = output
+                        , stderr = err
+                        , output = render_command['output']
+                        , timings = timings)
+
+
+def _generate(figure, terminal):
+    """generates the scripts of `figure`. Returns the wall time and, if the generation
+    failed, the error `RenderResult` (None otherwise).
+    """
+    t0 = time.time()
+    try:
+        figure.generate_gnuplot_file()
+    except Exception:
+        generate_time = time.time() - t0
+        return generate_time, RenderResult(figure = figure
+                                           , terminal = terminal
+                                           , status = "error"
+                                           , returncode = None
+                                           , stdout = ""
+                                           , stderr = traceback.format_exc()
+                                           , output = None
+                                           , timings = OrderedDict([('generate', generate_time)]))
+    return time.time() - t0, None
+
+
+def _render_one(figure, terminal, generate_time):
+    render_command = figure.get_render_command(terminal)
+
+    t0 = time.time()
+    try:
+        proc = _Popen(render_command['command']
+                      , shell = False
+                      , universal_newlines = True
+                      , cwd = render_command['cwd']
+                      , stdout = _PIPE
+                      , stderr = _PIPE)
+        output, err = proc.communicate()
+        returncode = proc.returncode
+    except OSError as e:
+        output, err, returncode = "", str(e), -1
+    render_time = time.time() - t0
+
+    return _render_result(figure, terminal, render_command, generate_time, render_time
+                          , output, err, returncode)
+
+
+def render_many(figures, terminal = "pdflatex", max_workers = None):
+    """Generates and renders many figures concurrently.
+
+    The scripts of all the figures are generated first, then the compile
+    scripts run in parallel, at most `max_workers` at a time, also for
+    figures sharing a folder (their intermediate files are kept apart).
+    A figure failing to generate gets an error result, the others are still rendered.
+
+    Parameters
+    ----------------
+    figures: iterable of AutoGnuplotFigure
+    terminal: str, optional
+         ("pdflatex") `"pdflatex"`, `"tikz"` or `"jpg"` (see `AutoGnuplotFigure.get_render_command`)
+    max_workers: int, optional
+         (None) maximum number of concurrent renderings, defaults to the number of cpus.
+
+    Returns
+    ----------------
+    list of `RenderResult`, in the order of `figures`.
+
+    Examples
+    ----------------
+    >>> results = autogpy.render_many(figs, max_workers = 32)
+    >>> failed = [r for r in results if r.status != "ok"]
+    """
+    figures = list(figures)
+    max_workers = max_workers or os.cpu_count() or 1
+
+    generated = [_generate(figure, terminal) for figure in figures]
+
+    with ThreadPoolExecutor(max_workers = max_workers) as executor:
+        futures = [executor.submit(_render_one, figure, terminal, generate_time) if error is None else None
+                   for figure, (generate_time, error) in zip(figures, generated)]
+        return [error if future is None else future.result()
+                for future, (_, error) in zip(futures, generated)]
@@ -0,0 +1,118 @@
+"""
+This file is part of Autognuplotpy, autogpy.
+
+Compressed dataset files, decompressed on the fly by gnuplot via a pipe
+(e.g. `plot "< gzip -dc data.dat.gz"`).
+"""
+import collections
+import os
+import shutil
+import subprocess
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+# compress -> (file extension, command decompressing to stdout)
+COMPRESSIONS = {
+    "gz" : (".gz", "gzip -dc")
+    , "zstd" : (".zst", "zstd -dcq")
+    , "lz4" : (".lz4", "lz4 -dcq")
+}
+
+
+def check_compress(compress):
+    """raises a ValueError if `compress` is not supported (None means no compression).
+    """
+    if compress is not None and compress not in COMPRESSIONS:
+        raise ValueError("compress '%s' not supported. Use one of: %s"
+                         % (compress, ", ".join(COMPRESSIONS)))
+
+
+def extension(compress):
+    return COMPRESSIONS[compress][0] if compress is not None else ""
+
+
+def gnuplot_source(compress):
+    """string replacing `"{DS_FNAME}"` in the gnuplot command templates for compressed datasets.
+    The file name is quoted for the shell running the pipe (e.g. identifiers with spaces).
+    """
+    return '"< %s \'{DS_FNAME}\'"' % COMPRESSIONS[compress][1]
+
+
+def _gzip_member(block):
+    # each block is a complete gzip member; concatenated members form a valid gzip file.
+    # zlib writes no timestamp, hence equal data give equal files.
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    return compressor.compress(block) + compressor.flush()
+
+
+def _lz4_frame(block):
+    import lz4.frame
+    # concatenated frames are decompressed as one stream
+    return lz4.frame.compress(block)
+
+
+def _write_parallel(f, blocks, compress_block, max_workers):
+    """compresses `blocks` with `compress_block` in a thread pool (zlib and
+    lz4 release the GIL) and writes them in order. At most `2 * max_workers`
+    blocks are held in memory.
+    """
+    with ThreadPoolExecutor(max_workers = max_workers) as executor:
+        pending = collections.deque()
+        for block in blocks:
+            pending.append(executor.submit(compress_block, block))
+            if len(pending) >= 2 * max_workers:
+                f.write(pending.popleft().result())
+        while pending:
+            f.write(pending.popleft().result())
+
+
+def _write_via_command(fname, blocks, command):
+    with open(fname, 'wb') as f:
+        proc = subprocess.Popen(command, stdin = subprocess.PIPE, stdout = f)
+        try:
+            for block in blocks:
+                proc.stdin.write(block)
+        finally:
+            proc.stdin.close()
+            returncode = proc.wait()
+    if returncode != 0:
+        raise RuntimeError("'%s' failed with return code %d" % (" ".join(command), returncode))
+
+
+def write_compressed(fname, blocks, compress, max_workers = None):
+    """writes the byte `blocks` to `fname`, compressed with `compress`.
+
+    gz and lz4 blocks are compressed by a pool of `max_workers` threads
+    (default: cpu count). zstd uses the `zstandard` package with its own
+    threads, otherwise the `zstd` command line tool (`-T0`). lz4 falls back
+    to the `lz4` command line tool when the `lz4` package is not installed.
+    """
+    check_compress(compress)
+    max_workers = max_workers or os.cpu_count() or 1
+
+    if compress == "gz":
+        with open(fname, 'wb') as f:
+            _write_parallel(f, blocks, _gzip_member, max_workers)
+
+    elif compress == "lz4":
+        try:
+            import lz4.frame
+        except ImportError:
+            if shutil.which("lz4") is None:
+                raise RuntimeError("compress='lz4' requires the lz4 package or the lz4 command.")
+            return _write_via_command(fname, blocks, ["lz4", "-q", "-c"])
+        with open(fname, 'wb') as f:
+            _write_parallel(f, blocks, _lz4_frame, max_workers)
+
+    elif compress == "zstd":
+        try:
+            import zstandard
+        except ImportError:
+            if shutil.which("zstd") is None:
+                raise RuntimeError("compress='zstd' requires the zstandard package or the zstd command.")
+            return _write_via_command(fname, blocks, ["zstd", "-q", "-c", "-T%d" % max_workers])
+        compressor = zstandard.ZstdCompressor(threads = max_workers)
+        with open(fname, 'wb') as f:
+            with compressor.stream_writer(f, closefd = False) as writer:
+                for block in blocks:
+                    writer.write(block)
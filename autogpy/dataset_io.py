@@ -0,0 +1,552 @@
+"""
+This file is part of Autognuplotpy, autogpy.
+
+Serialization of the datasets referenced by the gnuplot scripts.
+"""
+import filecmp
+import hashlib
+import io
+import mmap
+import os
+import re
+import uuid
+
+import numpy as np
+
+from . import compression
+
+# data_format -> (numpy dtype, gnuplot binary format specifier)
+BINARY_FORMATS = {
+    "binary" : ("<f8", "%double")
+    , "binary64" : ("<f8", "%double")
+    , "binary32" : ("<f4", "%float")
+}
+
+DATA_FORMATS = ("text",) + tuple(BINARY_FORMATS.keys())
+
+# numpy dtype (without byte order) -> gnuplot binary format specifier,
+# for on-disk arrays referenced in place
+GNUPLOT_BINARY_TYPES = {
+    "f8" : "%double", "f4" : "%float"
+    , "i1" : "%int8", "u1" : "%uint8"
+    , "i2" : "%int16", "u2" : "%uint16"
+    , "i4" : "%int32", "u4" : "%uint32"
+    , "i8" : "%int64", "u8" : "%uint64"
+}
+
+# file extensions of the array files accepted as dataset arguments
+ARRAY_FILE_EXTENSIONS = (".npy", ".npz")
+
+# content-addressed name of the files of a DatasetStore (see `DatasetStore.path`)
+_STORE_FNAME_RE = re.compile(r"^ds_[0-9a-f]{32}\.(dat|bin)(%s)?$"
+                             % "|".join(re.escape(ext) for ext, _ in compression.COMPRESSIONS.values()))
+
+# where the text datasets are kept: one file each, or datablocks of the gnuplot script
+DATA_STORAGES = ("files", "inline")
+
+# upper bound of the characters of a "%.18e" value (e.g. "-1.797693134862315708e+308") and its separator
+TEXT_BYTES_PER_VALUE = len("%.18e" % -np.finfo(np.float64).max) + 1
+
+# rows formatted/converted at once by the writers. Bounds their extra memory.
+BLOCK_ROWS = 1 << 16
+
+# size of the buffer of the output files
+WRITE_BUFFER_SIZE = 1 << 22
+
+
+class DatasetWriteError(RuntimeError):
+    """raised when deferred dataset writes fail (see `wait_writes`).
+    """
+    pass
+
+
+_write_executor = None
+
+
+def get_write_executor():
+    """thread pool shared by the deferred dataset writes, created at the first call.
+    """
+    global _write_executor
+    if _write_executor is None:
+        from concurrent.futures import ThreadPoolExecutor
+        _write_executor = ThreadPoolExecutor(max_workers = os.cpu_count() or 1)
+    return _write_executor
+
+
+def snapshot(args):
+    """copies the dataset arguments, such that they can be written later even
+    if modified meanwhile. Memory-mapped arrays are referenced.
+    """
+    return [x if isinstance(x, np.memmap) else np.array(x, copy = True) for x in args]
+
+
+def wait_writes(pending):
+    """waits for the `(dataset_fname, future)` pairs in `pending`.
+
+    Raises a `DatasetWriteError` naming every dataset whose write failed,
+    chained to the first error.
+    """
+    errors = []
+    for dataset_fname, future in pending:
+        try:
+            future.result()
+        except Exception as e:
+            errors.append((dataset_fname, e))
+    if errors:
+        raise DatasetWriteError("writing dataset(s) failed:\n" + "\n".join(
+            "  %s: %s: %s" % (dataset_fname, type(e).__name__, e) for dataset_fname, e in errors)
+        ) from errors[0][1]
+
+
+def check_data_format(data_format):
+    """raises a ValueError if `data_format` is not supported.
+    """
+    if data_format not in DATA_FORMATS:
+        raise ValueError("data_format '%s' not supported. Use one of: %s"
+                         % (data_format, ", ".join(DATA_FORMATS)))
+
+
+def is_binary_format(data_format):
+    return data_format in BINARY_FORMATS
+
+
+def check_data_storage(data_storage):
+    """raises a ValueError if `data_storage` is not supported.
+    """
+    if data_storage not in DATA_STORAGES:
+        raise ValueError("data_storage '%s' not supported. Use one of: %s"
+                         % (data_storage, ", ".join(DATA_STORAGES)))
+
+
+def as_columns(args):
+    """casts the dataset arguments to a list of 2D arrays (rows x columns).
+
+    1D arguments become single columns, 2D arguments are kept
+    (this allows `for` loops over columns).
+    """
+    xyzt = [np.asarray(x) for x in args]
+    columns = [x[:, np.newaxis] if x.ndim == 1 else x for x in xyzt]
+    check_same_rows(columns)
+    return columns
+
+
+def check_same_rows(columns):
+    """raises a ValueError if the columns (as from `as_columns`) do not have the same number of rows.
+    """
+    lengths = [c.shape[0] for c in columns]
+    if len(set(lengths)) > 1:
+        raise ValueError("the dataset columns have different lengths: %s."
+                         % ", ".join(str(n) for n in lengths))
+
+
+def iter_row_blocks(columns, dtype = None, block_rows = None):
+    """yields the rows of the columns (as from `as_columns`) in blocks of
+    at most `block_rows` rows, each block being a (rows x columns) array.
+
+    The columns are read in place (e.g. from memory-mapped files) and never
+    concatenated as a whole.
+    """
+    block_rows = block_rows or BLOCK_ROWS
+    check_same_rows(columns)
+    n_rows = columns[0].shape[0]
+    n_cols = sum(c.shape[1] for c in columns)
+    if dtype is None:
+        dtype = np.result_type(*columns)
+
+    for start in range(0, n_rows, block_rows):
+        stop = min(start + block_rows, n_rows)
+        block = np.empty((stop - start, n_cols), dtype = dtype)
+        col_idx = 0
+        for c in columns:
+            block[:, col_idx : col_idx + c.shape[1]] = c[start:stop]
+            col_idx += c.shape[1]
+        yield block
+
+
+def is_array_file(x):
+    """True if `x` is the path (str or path-like) of a `.npy` or `.npz` file.
+    """
+    return isinstance(x, (str, os.PathLike)) and os.fspath(x).endswith(ARRAY_FILE_EXTENSIONS)
+
+
+def _npz_member_memmap(npz_fname, member):
+    """memory-maps an array of an uncompressed `.npz` file (as written by
+    `np.savez`). Returns None if the member is compressed.
+    """
+    import zipfile
+    with zipfile.ZipFile(npz_fname) as zf:
+        info = zf.getinfo(member)
+        if info.compress_type != zipfile.ZIP_STORED:
+            return None
+
+    with open(npz_fname, 'rb') as f:
+        # the member data follow its local header, whose extra field
+        # can differ from the one in the central directory
+        f.seek(info.header_offset + 26)
+        name_len, extra_len = np.frombuffer(f.read(4), dtype = "<u2")
+        data_offset = info.header_offset + 30 + int(name_len) + int(extra_len)
+
+        f.seek(data_offset)
+        version = np.lib.format.read_magic(f)
+        if version == (1, 0):
+            shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+        else:
+            shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+        array_offset = f.tell()
+
+    if dtype.hasobject:
+        return None
+    return np.memmap(npz_fname, dtype = dtype, mode = 'r', offset = array_offset
+                     , shape = shape, order = 'F' if fortran_order else 'C')
+
+
+def load_array_file(fname):
+    """opens a `.npy` or `.npz` file without reading it in memory.
+
+    Returns the list of its arrays, memory-mapped when possible (`.npy`
+    files and arrays of uncompressed `.npz` files), in the stored order.
+    Compressed `.npz` arrays are read one at a time.
+    """
+    fname = os.fspath(fname)
+    if fname.endswith(".npy"):
+        return [np.load(fname, mmap_mode = 'r')]
+
+    arrays = []
+    with np.load(fname) as npz:
+        for key in npz.files:
+            x = _npz_member_memmap(fname, key + ".npy")
+            arrays.append(x if x is not None else npz[key])
+    return arrays
+
+
+def resolve_array_inputs(args):
+    """replaces the `.npy`/`.npz` paths in the dataset arguments `args` with
+    their (memory-mapped) arrays. The arrays of a `.npz` file become
+    consecutive arguments.
+    """
+    if not any(is_array_file(x) for x in args):
+        return args
+    resolved = []
+    for x in args:
+        if is_array_file(x):
+            resolved.extend(load_array_file(x))
+        else:
+            resolved.append(x)
+    return resolved
+
+
+def memmap_location(x):
+    """(file name, byte offset) of the data of `x` if it is a view of a
+    `np.memmap`, otherwise None.
+    """
+    if not isinstance(x, np.memmap) or x.filename is None:
+        return None
+
+    # slices inherit the offset of their parent: the offset of the array
+    # created on the mmap buffer is the reliable one
+    root = x
+    while isinstance(root.base, np.ndarray):
+        root = root.base
+    if not isinstance(root, np.memmap) or not isinstance(root.base, mmap.mmap):
+        return None
+
+    delta = x.__array_interface__['data'][0] - root.__array_interface__['data'][0]
+    return x.filename, root.offset + delta
+
+
+def inplace_binary_source(args):
+    """gnuplot reference to the on-disk data of `args`, without any copy.
+
+    This is possible for a single memory-mapped, C-contiguous, 1D or 2D
+    array, whose little-endian dtype is readable by gnuplot. Returns the
+    file name and the clause to append, or None.
+    """
+    if len(args) != 1:
+        return None
+    x = args[0]
+    location = memmap_location(x)
+    if location is None or x.ndim not in (1, 2) or not x.flags.c_contiguous:
+        return None
+
+    byteorder, dtype_key = x.dtype.str[0], x.dtype.str[1:]
+    if byteorder not in "<|" or dtype_key not in GNUPLOT_BINARY_TYPES:
+        return None
+
+    fname, offset = location
+    n_rows = x.shape[0]
+    n_cols = x.shape[1] if x.ndim == 2 else 1
+    clause = 'binary skip={SKIP} format="{FMT}" record={N_ROWS} endian=little'.format(
+        SKIP = offset
+        , FMT = GNUPLOT_BINARY_TYPES[dtype_key] * n_cols
+        , N_ROWS = n_rows)
+    return fname, clause
+
+
+def iter_text_blocks(columns, fmt = "%.18e", block_rows = None):
+    """yields the text (as bytes) of the columns (as from `as_columns`), block by block.
+
+    The text is the same as the one of `np.savetxt(fname, data, fmt)`, with
+    `data` the columns side by side. Each block is formatted with a single
+    `%` operation.
+    """
+    if any(np.iscomplexobj(c) for c in columns):
+        # complex numbers have a dedicated formatting in savetxt
+        buffer = io.BytesIO()
+        np.savetxt(buffer, np.concatenate(columns, axis = 1), fmt = fmt)
+        yield buffer.getvalue()
+        return
+
+    n_cols = sum(c.shape[1] for c in columns)
+    row_fmt = " ".join([fmt] * n_cols) + "\n"
+    for block in iter_row_blocks(columns, block_rows = block_rows):
+        # tolist yields python scalars, which format faster than numpy ones
+        yield ((row_fmt * block.shape[0]) % tuple(block.ravel().tolist())).encode("latin-1")
+
+
+def write_text(fname, args, fmt = "%.18e", block_rows = None, compress = None):
+    """writes the columns in `args` as a text file, possibly compressed (see `compression.write_compressed`).
+
+    The output is the same as `np.savetxt(fname, data, fmt)`, with `data` the
+    columns side by side. Rows are formatted in blocks and the extra memory
+    is bounded by the block size.
+    """
+    columns = as_columns(args)
+    n_rows = columns[0].shape[0]
+    n_cols = sum(c.shape[1] for c in columns)
+
+    blocks = iter_text_blocks(columns, fmt, block_rows)
+    if compress is not None:
+        compression.write_compressed(fname, blocks, compress)
+    else:
+        with open(fname, 'wb', buffering = WRITE_BUFFER_SIZE) as f:
+            for block in blocks:
+                f.write(block)
+
+    return {'n_rows' : n_rows, 'n_cols' : n_cols}
+
+
+def estimate_text_size(args):
+    """upper bound of the size, in bytes, of the text written by `write_text`.
+    """
+    n_rows, n_cols = columns_shape(args)
+    return n_rows * n_cols * TEXT_BYTES_PER_VALUE
+
+
+def format_text(args):
+    """the text written by `write_text`, as a string.
+    """
+    return b"".join(iter_text_blocks(as_columns(args))).decode("latin-1")
+
+
+def gnuplot_datablock(name, text):
+    """gnuplot definition of the datablock `name` (e.g. `$DATA_0`) containing `text`.
+    """
+    if text and not text.endswith("\n"):
+        text += "\n"
+    return "{NAME} << EOD\n{TEXT}EOD\n".format(NAME = name, TEXT = text)
+
+
+def write_binary(fname, args, data_format = "binary", block_rows = None):
+    """writes the columns in `args` as raw little-endian floats, row-major.
+
+    The resulting file is read by gnuplot with the clause returned by
+    `gnuplot_binary_clause`.
+    """
+    dtype, _ = BINARY_FORMATS[data_format]
+    columns = as_columns(args)
+    n_rows = columns[0].shape[0]
+    n_cols = sum(c.shape[1] for c in columns)
+
+    with open(fname, 'wb', buffering = WRITE_BUFFER_SIZE) as f:
+        for block in iter_row_blocks(columns, dtype = dtype, block_rows = block_rows):
+            f.write(block.tobytes())
+
+    return {'n_rows' : n_rows, 'n_cols' : n_cols}
+
+
+def columns_shape(args):
+    """(rows, columns) of the dataset made by the columns in `args`.
+    """
+    columns = as_columns(args)
+    return columns[0].shape[0], sum(c.shape[1] for c in columns)
+
+
+def check_write_options(data_format = "text", compress = None):
+    """raises a ValueError for unsupported combinations of `data_format` and `compress`.
+    """
+    check_data_format(data_format)
+    compression.check_compress(compress)
+    if compress is not None and is_binary_format(data_format):
+        raise ValueError("compressed datasets must be in text data_format.")
+
+
+def write_dataset(fname, args, data_format = "text", compress = None):
+    """writes the columns in `args` to `fname` in the given `data_format`, possibly compressed.
+    """
+    if is_binary_format(data_format):
+        return write_binary(fname, args, data_format)
+    return write_text(fname, args, compress = compress)
+
+
+def replace_if_changed(tmp_fname, fname):
+    """moves `tmp_fname` onto `fname`, unless `fname` already has the same
+    content. In this case `tmp_fname` is removed and `fname`, with its
+    modification time, is left untouched.
+
+    Returns True if `fname` has been replaced.
+    """
+    if os.path.isfile(fname) and filecmp.cmp(tmp_fname, fname, shallow = False):
+        os.remove(tmp_fname)
+        return False
+    os.replace(tmp_fname, fname)
+    return True
+
+
+def new_temp_file(folder, prefix):
+    """creates an empty, uniquely named temporary file in `folder` and returns its path.
+    Unlike `tempfile.mkstemp` (mode 0600), the permissions follow the umask, as for
+    files created by `open`: the datasets moved in place stay readable by other users.
+    """
+    while True:
+        tmp_fname = os.path.join(folder or ".", prefix + uuid.uuid4().hex + ".tmp")
+        try:
+            with open(tmp_fname, "xb"):
+                return tmp_fname
+        except FileExistsError:
+            continue
+
+
+def write_dataset_if_changed(fname, writer):
+    """calls `writer` on a temporary file next to `fname`, then replaces
+    `fname` only if the content changed (see `replace_if_changed`).
+    """
+    folder, base = os.path.split(fname)
+    tmp_fname = new_temp_file(folder, "." + base + ".")
+    try:
+        out = writer(tmp_fname)
+        replace_if_changed(tmp_fname, fname)
+    except BaseException:
+        if os.path.exists(tmp_fname):
+            os.remove(tmp_fname)
+        raise
+    return out
+
+
+def hash_file(fname, h, block_size = 1 << 20):
+    """updates the hashlib object `h` with the content of `fname`, read in blocks.
+    """
+    with open(fname, 'rb') as f:
+        for block in iter(lambda : f.read(block_size), b''):
+            h.update(block)
+    return h
+
+
+def dataset_source(args, data_format = "text", compress = None):
+    """string replacing `"{DS_FNAME}"` in the gnuplot command templates.
+
+    It includes the `binary` clause for binary datasets and the decompressing
+    pipe for compressed ones.
+    """
+    if compress is not None:
+        return compression.gnuplot_source(compress)
+    if is_binary_format(data_format):
+        n_rows, n_cols = columns_shape(args)
+        return '"{DS_FNAME}" ' + gnuplot_binary_clause(n_cols, n_rows, data_format)
+    return '"{DS_FNAME}"'
+
+
+def gnuplot_binary_clause(n_cols, n_rows, data_format = "binary"):
+    """gnuplot clause reading a file written by `write_binary`.
+    """
+    _, specifier = BINARY_FORMATS[data_format]
+    return 'binary format="{FMT}" record={N_ROWS} endian=little'.format(
+        FMT = specifier * n_cols
+        , N_ROWS = n_rows)
+
+
+def save_npy(fname, args):
+    """dumps `args` to a `.npy` file. A single argument is saved as is,
+    several arguments are saved as columns.
+    """
+    if len(args) == 1:
+        data = np.asarray(args[0])
+    else:
+        data = np.concatenate(as_columns(args), axis = 1)
+    np.save(fname, data)
+
+
+class DatasetStore(object):
+    """Content-addressed storage for datasets.
+
+    Each dataset is named after a hash of its columns (and of the
+    `data_format`), hence identical data are serialized once and shared
+    by any figure using the same store.
+
+    Parameters
+    ---------------------
+    root: str
+         folder containing the dataset files. It can be shared between
+         several figure folders.
+
+    Examples
+    ----------------
+    >>> store = DatasetStore('my_project/datasets')
+    >>> fig_a = AutoGnuplotFigure('my_project/fig_a', dataset_store = store)
+    >>> fig_b = AutoGnuplotFigure('my_project/fig_b', dataset_store = store)
+    >>> fig_a.plot(x, y) # writes my_project/datasets/ds_<hash>.dat
+    >>> fig_b.plot(x, y) # no write, refers to the same file
+    """
+
+    def __init__(self, root):
+        self.root = root
+
+    def digest(self, args, data_format = "text", compress = None):
+        """hash of the dataset columns. The array buffers are hashed
+        without copies when contiguous.
+        """
+        h = hashlib.blake2b(digest_size = 16)
+        h.update(data_format.encode())
+        h.update(str(compress).encode())
+        for x in as_columns(args):
+            h.update(("|%s%s" % (x.dtype.str, x.shape)).encode())
+            if x.flags.c_contiguous:
+                h.update(memoryview(x).cast('B'))
+            else:
+                # no whole copy, e.g. of memory-mapped Fortran arrays
+                for block in iter_row_blocks([x], dtype = x.dtype):
+                    h.update(memoryview(block).cast('B'))
+        return h.hexdigest()
+
+    def path(self, digest, data_format = "text", compress = None):
+        ext = ".bin" if is_binary_format(data_format) else ".dat"
+        return os.path.join(self.root, "ds_" + digest + ext + compression.extension(compress))
+
+    def owns(self, path):
+        """True if `path` is a file of this store: in its root and named after a digest.
+        Other files in the root (e.g. the figure folder, with `dataset_store = True`) are not.
+        """
+        return (_STORE_FNAME_RE.match(os.path.basename(path)) is not None
+                and os.path.abspath(os.path.dirname(path)) == os.path.abspath(self.root))
+
+    def store(self, args, data_format = "text", compress = None, digest = None):
+        """writes the dataset, unless already present, and returns its path.
+        `digest` can be passed if already computed.
+        """
+        if digest is None:
+            digest = self.digest(args, data_format, compress)
+        path = self.path(digest, data_format, compress)
+        if os.path.exists(path):
+            return path
+
+        if not os.path.exists(self.root):
+            os.makedirs(self.root, exist_ok = True)
+
+        # write-and-rename, a concurrent reader never sees partial files
+        tmp_path = new_temp_file(self.root, ".ds_")
+        try:
+            write_dataset(tmp_path, args, data_format, compress)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+        return path
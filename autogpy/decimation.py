@@ -0,0 +1,110 @@
+"""
+This file is part of Autognuplotpy, autogpy.
+
+Decimation of large line series to the resolution of the output figure.
+
+Both methods return the indices of the samples to keep, which are then
+applied to every column of a dataset.
+"""
+import numpy as np
+
+DECIMATION_METHODS = ("minmax", "lttb")
+
+
+def minmax_indices(x, y, n_buckets):
+    """min/max per bucket decimation.
+
+    The x range is split in `n_buckets` equal intervals (ideally one per
+    pixel), for each of which the samples with the minimum and maximum `y`
+    are kept, together with the first and last samples. The rendered line
+    is then visually the same as the one of the full series.
+
+    `x` is expected to be sorted.
+    """
+    n = len(x)
+    if n <= 2 * n_buckets + 2:
+        return np.arange(n)
+
+    edges = np.linspace(x[0], x[-1], n_buckets + 1)
+    starts = np.searchsorted(x, edges[:-1], side = 'left')
+    stops = np.append(starts[1:], n)
+
+    indices = [0, n - 1]
+    for start, stop in zip(starts, stops):
+        if stop > start:
+            y_bucket = y[start:stop]
+            indices.append(start + np.argmin(y_bucket))
+            indices.append(start + np.argmax(y_bucket))
+
+    return np.unique(indices)
+
+
+def lttb_indices(x, y, n_out):
+    """Largest-Triangle-Three-Buckets decimation (Steinarsson, 2013).
+
+    Keeps the first and last samples and, for each of `n_out - 2` buckets of
+    samples, the one forming the largest triangle with the sample kept in the
+    previous bucket and the average of the next bucket.
+
+    `x` is expected to be sorted.
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype = float)
+    y = np.asarray(y, dtype = float)
+
+    bucket_edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    indices = np.empty(n_out, dtype = int)
+    indices[0] = 0
+    indices[-1] = n - 1
+
+    a = 0
+    for i in range(n_out - 2):
+        start, stop = bucket_edges[i], bucket_edges[i + 1]
+        next_start, next_stop = bucket_edges[i + 1], (bucket_edges[i + 2] if i + 2 < n_out - 1 else n)
+
+        x_avg = x[next_start:next_stop].mean()
+        y_avg = y[next_start:next_stop].mean()
+
+        areas = np.abs((x[a] - x_avg) * (y[start:stop] - y[a])
+                       - (x[a] - x[start:stop]) * (y_avg - y[a]))
+        a = start + np.argmax(areas)
+        indices[i + 1] = a
+
+    return indices
+
+
+def decimation_indices(x, y, method, n_pixels, logx = False, logy = False):
+    """indices of the samples kept by `method` (`"minmax"` or `"lttb"`) for a
+    figure `n_pixels` wide.
+
+    With `logx` (`logy`) the decimation happens in the log space of the x (y)
+    axis, so that buckets are equally spaced on screen. Non-positive values,
+    which gnuplot does not show on log axes, are left out.
+    """
+    if method not in DECIMATION_METHODS:
+        raise ValueError("decimate '%s' not supported. Use one of: %s"
+                         % (method, ", ".join(DECIMATION_METHODS)))
+
+    x = np.asarray(x)
+    y = np.asarray(y)
+
+    valid = None
+    if logx or logy:
+        valid = np.ones(len(x), dtype = bool)
+        if logx:
+            valid &= x > 0
+        if logy:
+            valid &= y > 0
+        valid = np.flatnonzero(valid)
+        x = np.log10(x[valid]) if logx else x[valid]
+        y = np.log10(y[valid]) if logy else y[valid]
+
+    if method == "minmax":
+        indices = minmax_indices(x, y, n_pixels)
+    else:
+        indices = lttb_indices(x, y, 2 * n_pixels)
+
+    return indices if valid is None else valid[indices]
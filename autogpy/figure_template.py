@@ -0,0 +1,234 @@
+"""
+This file is part of Autognuplotpy, autogpy.
+
+Figure templates: the structure of a figure stamped out with new data many
+times (e.g. parameter sweeps), all instances rendered by one gnuplot call.
+"""
+import re
+import time
+from collections import OrderedDict
+from subprocess import Popen as _Popen, PIPE as _PIPE
+
+from . import autognuplot_terms
+from . import compression
+from . import dataset_io
+from . import plot_helpers
+
+# terminal -> extension of the outputs
+TEMPLATE_TERMINALS = {"pngcairo" : ".png", "pdfcairo" : ".pdf"}
+
+# quoted dataset source, with its binary clause if any, or datablock name
+_SOURCE_RE = re.compile(r'"[^"]*\{DS_FNAME\}[^"]*"(\s+binary(\s+\w+=("[^"]*"|\S+))*)?|\{DS_FNAME\}')
+
+# dataset of a slot of an instance, in the figure folder
+_DATASET_FNAME = "{ID}__inst{I}__{K}__.dat{EXT}"
+
+_VARIABLE_NAME_RE = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+
+class FigureTemplate(object):
+    """Captures the structure of a figure (preamble, `set` calls, multiplot layout, plot styles),
+    to render it for many instances of its datasets in a single gnuplot call.
+
+    Every dataset plotted (or fitted) by the figure is a slot, in order of appearance. Each instance
+    binds new data to all the slots and, optionally, values to the template `variables`. The
+    rendering script loops over the instances (`do for`), hence gnuplot and the terminal are set
+    up once instead of once per figure. Each iteration starts with `reset` (which keeps the terminal),
+    so that the `set` calls of an instance do not leak into the next one.
+
+    Parameters
+    ---------------------
+    figure: AutoGnuplotFigure
+         the model figure. Its state at construction is captured; its folder and file identifier
+         name the instance datasets and outputs.
+    variables: list of str, optional
+         (()) names of gnuplot variables set per instance (see `add_instance`).
+    compress: str, optional
+         (None) compression of the instance datasets (see `AutoGnuplotFigure`), written as text.
+
+    Examples
+    ----------------
+    >>> fig = autogpy.Figure("sweep")
+    >>> fig.set("title sprintf('D = %g', D)")
+    >>> fig.plot("w l", x, y0)
+    >>> template = FigureTemplate(fig, variables = ["D"])
+    >>> for D in Ds:
+    >>>     template.add_instance((x, solve(D)), variables = {"D" : D})
+    >>> outputs = template.render("pngcairo") # sweep/fig__inst0.png, ...
+
+    Requires gnuplot >= 5.2 if `variables` are used (gnuplot arrays).
+    """
+
+    def __init__(self, figure, variables = (), compress = None):
+        dataset_io.check_write_options("text", compress)
+        for name in variables:
+            if not _VARIABLE_NAME_RE.match(name):
+                raise ValueError("'%s' is not a valid gnuplot variable name." % name)
+
+        self.figure = figure
+        self.variables = list(variables)
+        self.compress = compress
+        # per instance: dataset file names (relative to the figure folder) and variable values
+        self.instances = []
+
+        datasets_to_plot = []
+        self.n_slots = 0
+        for group in figure.datasets_to_plot:
+            template_group = []
+            for x in group:
+                x = dict(x)
+                if x['dataset_fname']:
+                    x['gnuplot_command_template'] = _SOURCE_RE.sub(
+                        "{DS_FNAME}", x['gnuplot_command_template'], count = 1)
+                    x['dataset_fname'] = self.__source_expression(self.n_slots)
+                    self.n_slots += 1
+                template_group.append(x)
+            datasets_to_plot.append(template_group)
+
+        self.body = figure._generate_template_body(
+            datasets_to_plot
+            , OrderedDict((name, "AUTOGPY_VAR_%s[AUTOGPY_I+1]" % name) for name in self.variables))
+        self.is_multiplot = figure.is_multiplot
+
+    def __dataset_fname(self, instance, slot):
+        return _DATASET_FNAME.format(ID = self.figure.file_identifier
+                                     , I = instance
+                                     , K = slot
+                                     , EXT = compression.extension(self.compress))
+
+    def __source_expression(self, slot):
+        """gnuplot expression of the source of `slot` at the instance `AUTOGPY_I`."""
+        pattern = _DATASET_FNAME.format(ID = self.figure.file_identifier.replace("%", "%%")
+                                        , I = "%d"
+                                        , K = slot
+                                        , EXT = compression.extension(self.compress))
+        source = dataset_io.dataset_source([], "text", self.compress).replace("{DS_FNAME}", pattern)
+        return "sprintf(%s, AUTOGPY_I)" % source
+
+    def __len__(self):
+        return len(self.instances)
+
+    def add_instance(self, *datasets, **kw):
+        """Adds an instance, writing its datasets.
+
+        Parameters
+        ---------------------
+        *datasets: tuple of arrays
+             one per slot, each holding the columns as passed to `plot` (e.g. `(x, y)`), or a 2D array.
+        variables: dict, optional
+             (None) value of each template variable, rendered as by `add_variable_declaration`
+             (e.g. pass `'"text"'` for strings).
+
+        Returns
+        ---------------------
+        template: FigureTemplate
+        """
+        if len(datasets) != self.n_slots:
+            raise ValueError("the template has %d dataset slots, %d datasets given."
+                             % (self.n_slots, len(datasets)))
+        variables = kw.get("variables") or {}
+        if set(variables) != set(self.variables):
+            raise ValueError("values expected for the variables %s, given for %s."
+                             % (sorted(self.variables), sorted(variables)))
+
+        instance = len(self.instances)
+        fnames = []
+        for slot, args in enumerate(datasets):
+            args = list(args) if isinstance(args, (tuple, list)) else [args]
+            fname = self.__dataset_fname(instance, slot)
+            dataset_io.write_dataset_if_changed(
+                self.figure.globalize_fname(fname)
+                , lambda tmp_fname : dataset_io.write_dataset(tmp_fname, args, "text", self.compress))
+            fnames.append(fname)
+
+        self.instances.append({'datasets' : fnames
+                               , 'variables' : {name : str(variables[name]) for name in self.variables}})
+        return self
+
+    def get_outputs(self, terminal = "pngcairo"):
+        """paths of the files rendered by `terminal`, one per instance."""
+        check_template_terminal(terminal)
+        return [self.figure.globalize_fname("%s__inst%d%s" % (self.figure.file_identifier, i
+                                                              , TEMPLATE_TERMINALS[terminal]))
+                for i in range(len(self.instances))]
+
+    def get_gnuplot_file_content(self, terminal = "pngcairo"):
+        """the script rendering all the instances."""
+        check_template_terminal(terminal)
+        if not self.instances:
+            raise ValueError("the template has no instances, see `add_instance`.")
+
+        parameters = self.figure.pdflatex_terminal_parameters
+        if terminal == "pngcairo":
+            size = "%d,%d" % tuple(
+                plot_helpers.terminal_size_to_pixels(parameters[k], self.figure.pdflatex_jpg_convert_density)
+                for k in ["x_size", "y_size"])
+        else:
+            size = "{x_size},{y_size}".format(**parameters)
+
+        arrays = "\n".join(
+            "array AUTOGPY_VAR_{NAME}[{N}] = [{VALUES}]".format(
+                NAME = name
+                , N = len(self.instances)
+                , VALUES = ", ".join(x['variables'][name] for x in self.instances))
+            for name in self.variables)
+
+        return autognuplot_terms.TEMPLATE_wrapper_file.format(
+            TERMINAL = terminal
+            , SIZE = size
+            , FONT_SIZE = plot_helpers.terminal_font_size(parameters['font'])
+            , linewidth = parameters['linewidth']
+            , ARRAYS = arrays
+            , LAST = len(self.instances) - 1
+            , OUTFILE_PATTERN = "%s__inst%%d%s" % (self.figure.file_identifier.replace("%", "%%")
+                                                   , TEMPLATE_TERMINALS[terminal])
+            , BODY = self.body
+            , UNSET_MULTIPLOT = "unset multiplot" if self.is_multiplot else "")
+
+    def generate_gnuplot_file(self, terminal = "pngcairo"):
+        """writes the script rendering all the instances. Returns its name, relative to the figure folder."""
+        local_fname = "%s__.template.%s.gnu" % (self.figure.file_identifier, terminal)
+        plot_helpers.write_if_changed(self.figure.globalize_fname(local_fname)
+                                      , self.get_gnuplot_file_content(terminal))
+        return local_fname
+
+    def render(self, terminal = "pngcairo"):
+        """Renders all the instances with a single gnuplot call, from the figure folder.
+
+        The wall time is recorded in the `render_stats` of the figure, as terminal `"template <terminal>"`.
+
+        Returns
+        ---------------------
+        list of the paths of the rendered files, one per instance (see `get_outputs`).
+
+        Raises
+        ---------------------
+        RuntimeError
+             if gnuplot fails, with its stderr.
+        """
+        local_fname = self.generate_gnuplot_file(terminal)
+
+        t0 = time.perf_counter()
+        try:
+            proc = _Popen(["gnuplot", local_fname]
+                          , shell = False
+                          , universal_newlines = True
+                          , cwd = self.figure.folder_name
+                          , stdout = _PIPE
+                          , stderr = _PIPE)
+            output, err = proc.communicate()
+            returncode = proc.returncode
+        except OSError as e:
+            output, err, returncode = "", str(e), -1
+        wall_time = time.perf_counter() - t0
+        self.figure.render_stats.add_render("template " + terminal, wall_time, {'gnuplot' : wall_time})
+
+        if returncode != 0:
+            raise RuntimeError("rendering the template %s failed:\n%s" % (local_fname, err))
+        return self.get_outputs(terminal)
+
+
+def check_template_terminal(terminal):
+    if terminal not in TEMPLATE_TERMINALS:
+        raise ValueError("terminal '%s' not supported by templates. Use one of %s."
+                         % (terminal, sorted(TEMPLATE_TERMINALS)))
@@ -0,0 +1,153 @@
+"""
+This file is part of Autognuplotpy, autogpy.
+
+Long-lived gnuplot process, used to render previews without paying the
+process startup and terminal initialization at each call.
+"""
+import atexit
+import os
+import queue
+import subprocess
+import threading
+import uuid
+
+
+# closes the pending output and clears the state of the previous figure
+_RESET_COMMANDS = ["unset multiplot", "set output", "reset session"]
+
+
+class GnuplotSessionError(RuntimeError):
+    """raised when the gnuplot process dies or does not answer in time.
+    """
+    pass
+
+
+class GnuplotSession(object):
+    """Wraps a gnuplot process, driven via stdin/stdout pipes.
+
+    Each call sends the commands followed by a `print` of a sentinel string
+    and collects the output (stdout and stderr) until the sentinel is read.
+    A dead process is detected and restarted at the next call.
+
+    Parameters
+    ---------------------
+    command: list of str, optional
+         (`["gnuplot", "-"]`) command spawning gnuplot in interactive mode,
+         such that errors do not terminate the process.
+    timeout: float, optional
+         (120) seconds to wait for each call to complete.
+
+    Examples
+    ----------------
+    >>> session = GnuplotSession()
+    >>> session.load("fig__.jpg.gnu", cwd = "my_figure")
+    """
+
+    def __init__(self, command = None, timeout = 120):
+        self.command = list(command) if command is not None else ["gnuplot", "-"]
+        self.timeout = timeout
+        self._proc = None
+        self._lines = None
+        self._lock = threading.Lock()
+        self._sentinel = "__autogpy_done_%s__" % uuid.uuid4().hex
+
+    def is_alive(self):
+        return self._proc is not None and self._proc.poll() is None
+
+    def start(self):
+        """spawns the gnuplot process (stopping the current one, if any).
+        """
+        self.close()
+        self._proc = subprocess.Popen(self.command
+                                      , stdin = subprocess.PIPE
+                                      , stdout = subprocess.PIPE
+                                      , stderr = subprocess.STDOUT
+                                      , universal_newlines = True
+                                      , bufsize = 1)
+        self._lines = queue.Queue()
+        reader = threading.Thread(target = self.__read_output
+                                  , args = (self._proc.stdout, self._lines))
+        reader.daemon = True
+        reader.start()
+
+    @staticmethod
+    def __read_output(stream, lines):
+        for line in iter(stream.readline, ''):
+            lines.put(line)
+        # EOF: the process is gone
+        lines.put(None)
+
+    def close(self):
+        """terminates the gnuplot process.
+        """
+        if self.is_alive():
+            try:
+                self._proc.stdin.write("exit\n")
+                self._proc.stdin.close()
+                self._proc.wait(timeout = 5)
+            except Exception:
+                self._proc.kill()
+        self._proc = None
+
+    def execute(self, commands):
+        """sends `commands` (str) to gnuplot, waits for their completion and
+        returns the output produced.
+        """
+        with self._lock:
+            if not self.is_alive():
+                self.start()
+
+            try:
+                self._proc.stdin.write(commands + "\n")
+                self._proc.stdin.write('set print\nprint "%s"\n' % self._sentinel)
+                self._proc.stdin.flush()
+            except (IOError, OSError):
+                self._proc = None
+                raise GnuplotSessionError("the gnuplot process died.")
+
+            output = []
+            while True:
+                try:
+                    line = self._lines.get(timeout = self.timeout)
+                except queue.Empty:
+                    self._proc.kill()
+                    self._proc = None
+                    raise GnuplotSessionError("gnuplot did not answer within %s s. Output so far:\n%s"
+                                              % (self.timeout, "".join(output)))
+                if line is None:
+                    self._proc = None
+                    raise GnuplotSessionError("the gnuplot process died. Output:\n%s" % "".join(output))
+                # endswith: a prompt might precede the sentinel
+                if line.rstrip("\n").endswith(self._sentinel):
+                    return "".join(output)
+                output.append(line)
+
+    def reset(self):
+        """clears the gnuplot state left by the previous figure.
+        """
+        return self.execute("\n".join(_RESET_COMMANDS))
+
+    def load(self, script, cwd = None):
+        """loads `script` from the folder `cwd`, after a `reset`. The output
+        file is closed afterwards, so that it can be used right away.
+        """
+        commands = list(_RESET_COMMANDS)
+        if cwd is not None:
+            commands.append("cd '%s'" % os.path.abspath(cwd).replace("'", "''"))
+        commands += ["load '%s'" % script.replace("'", "''")
+                     , "unset multiplot"
+                     , "set output"]
+        return self.execute("\n".join(commands))
+
+
+_session = None
+
+
+def get_session():
+    """module-level session, spawned at the first call.
+    """
+    global _session
+    if _session is None:
+        _session = GnuplotSession()
+        atexit.register(_session.close)
+    return _session
@@ -0,0 +1,165 @@
+"""
+This file is part of Autognuplotpy, autogpy.
+
+Chunked histograms of samples that do not fit in memory (memory-mapped
+arrays, `.npy` files, iterators of chunks), counted by a pool of threads.
+"""
+import collections
+import collections.abc
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from . import dataset_io
+
+# samples histogrammed at once by each thread
+CHUNK_SIZE = 1 << 22
+
+
+def iter_array_chunks(x, chunk_size):
+    for start in range(0, x.shape[0], chunk_size):
+        yield x[start : start + chunk_size]
+
+
+def map_chunks(foo, chunks, max_workers):
+    """yields `foo(chunk)` for the `chunks`, computed by `max_workers` threads
+    (numpy releases the GIL on large arrays). At most `2 * max_workers`
+    chunks are in flight, which bounds the memory used with iterators.
+    """
+    with ThreadPoolExecutor(max_workers = max_workers) as executor:
+        pending = collections.deque()
+        for chunk in chunks:
+            pending.append(executor.submit(foo, chunk))
+            if len(pending) >= 2 * max_workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def as_samples(x):
+    """1D array (possibly memory-mapped) of the samples in `x`, or None if
+    `x` is an iterator of chunks. Any other sequence (e.g. `range`, `pd.Series`)
+    is converted to an array.
+    """
+    if dataset_io.is_array_file(x):
+        x = dataset_io.load_array_file(x)[0]
+    if isinstance(x, collections.abc.Iterator):
+        return None
+    if isinstance(x, np.ndarray):
+        return x.reshape(-1) if x.ndim != 1 else x
+    return np.asarray(x).reshape(-1)
+
+
+def _chunk_min_max(chunk):
+    chunk = np.asarray(chunk)
+    return chunk.min(), chunk.max()
+
+
+def sample_range(x, chunk_size = CHUNK_SIZE, max_workers = None):
+    """(min, max) of the 1D array `x`, computed chunk by chunk.
+    """
+    max_workers = max_workers or os.cpu_count() or 1
+    extrema = list(map_chunks(_chunk_min_max, iter_array_chunks(x, chunk_size), max_workers))
+    if not extrema:
+        return 0., 1.
+    lo, hi = min(e[0] for e in extrema), max(e[1] for e in extrema)
+    if not (np.isfinite(lo) and np.isfinite(hi)):
+        raise ValueError("autodetected range of [{}, {}] is not finite".format(lo, hi))
+    return lo, hi
+
+
+def histogram_bin_edges(x, bins = 10, range = None, chunk_size = CHUNK_SIZE, max_workers = None):
+    """bin edges, fixed before counting.
+
+    Explicit edges are returned as they are. Otherwise the range, if not
+    given, comes from a chunked pass over `x`. With string `bins` (numpy
+    estimators, e.g. `"auto"`) the bin width is estimated on a strided
+    subsample of at most `chunk_size` samples (all of them for smaller arrays).
+    """
+    if not isinstance(bins, (int, np.integer, str)):
+        return np.asarray(bins, dtype = float)
+
+    if x is None:
+        if range is None or isinstance(bins, str):
+            raise ValueError("histograms of iterators of chunks need explicit bin edges, "
+                             "or an integer number of bins and a range.")
+        return np.linspace(range[0], range[1], bins + 1)
+
+    if range is None:
+        range = sample_range(x, chunk_size, max_workers)
+
+    if isinstance(bins, str):
+        step = max(1, x.shape[0] // chunk_size)
+        return np.histogram_bin_edges(np.asarray(x[::step]), bins, range)
+
+    return np.histogram_bin_edges(np.empty(0), bins, range)
+
+
+def histogram(x
+              , bins = 10
+              , range = None
+              , density = False
+              , weights = None
+              , chunk_size = CHUNK_SIZE
+              , max_workers = None):
+    """Chunked, multi-threaded drop-in for `np.histogram`.
+
+    Parameters
+    ------------------------
+    x: np.array, np.memmap, path of a `.npy` file, or iterator of 1D arrays
+         samples. Arrays are flattened and read `chunk_size` samples at a time, iterators are
+         consumed once.
+    bins: int, str or sequence, optional
+         (10) as in `np.histogram`. Iterators need explicit edges or an integer with `range`.
+    range: (float, float), optional
+         (None) as in `np.histogram`. If None, computed by a first pass over the data.
+    density: bool, optional
+         (False) as in `np.histogram`.
+    weights: np.array, optional
+         (None) as in `np.histogram`, same shape as `x`. Not supported with iterators.
+    chunk_size: int, optional
+         (`CHUNK_SIZE`) samples counted at once by each thread.
+    max_workers: int, optional
+         (None) counting threads, cpu count by default.
+
+    Returns
+    ------------
+    counts, edges: as from `np.histogram`
+    """
+    max_workers = max_workers or os.cpu_count() or 1
+    samples = as_samples(x)
+    if samples is None and weights is not None:
+        raise ValueError("weights are not supported for iterators of chunks.")
+
+    edges = histogram_bin_edges(samples, bins, range, chunk_size, max_workers)
+
+    # the uniform bins path of np.histogram is much faster than the bisection
+    # of arbitrary edges, and counts each sample as on the whole array
+    if isinstance(bins, (int, np.integer)):
+        bins_kw = {'bins' : int(bins), 'range' : (edges[0], edges[-1])}
+    else:
+        bins_kw = {'bins' : edges}
+
+    if samples is None:
+        chunks = x
+        count = lambda chunk : np.histogram(np.asarray(chunk).reshape(-1), **bins_kw)[0]
+    elif weights is None:
+        chunks = iter_array_chunks(samples, chunk_size)
+        count = lambda chunk : np.histogram(chunk, **bins_kw)[0]
+    else:
+        weights = np.asarray(weights).reshape(-1)
+        chunks = zip(iter_array_chunks(samples, chunk_size), iter_array_chunks(weights, chunk_size))
+        count = lambda chunk : np.histogram(chunk[0], weights = chunk[1], **bins_kw)[0]
+
+    counts = None
+    for chunk_counts in map_chunks(count, chunks, max_workers):
+        counts = chunk_counts if counts is None else counts + chunk_counts
+    if counts is None:
+        counts = np.zeros(len(edges) - 1, dtype = np.intp if weights is None else float)
+
+    if density:
+        with np.errstate(all = 'ignore'):
+            counts = counts / np.diff(edges) / counts.sum()
+
+    return counts, edges
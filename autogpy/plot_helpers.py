@@ -1,3 +1,6 @@
+import os
+import re
+
 set_format_xy_latex_ndig = lambda ax, ndig = 1: \
     r"set format {ax} '$%.{ndig}f$'".format(ax=ax, ndig=ndig)
 
@@ -75,3 +78,70 @@ r"""\begin{figure}[t]
     .replace("$%_TIKZ", "" if tikz_enabled else "%")
 
     return text
+
+
+def write_if_changed(fname, content):
+    """Writes `content` to `fname` unless the file already holds it.
+
+    Unchanged files keep their modification time, so that `make` does
+    not rebuild the corresponding figures.
+
+    Returns
+    ---------
+    bool: True if the file has been written.
+    """
+    if os.path.isfile(fname):
+        with open(fname, 'r') as f:
+            if f.read() == content:
+                return False
+
+    with open(fname, 'w') as f:
+        f.write(content)
+    return True
+
+
+def terminal_size_to_pixels(size, dpi = 100):
+    """Converts a gnuplot terminal size (e.g. `"9.9cm"`, `"3.5in"`, `"5"`, the latter in inches) in pixels at the given `dpi`.
+    """
+    size = str(size).strip()
+    for unit, per_inch in [("cm", 2.54), ("mm", 25.4), ("in", 1.), ("pt", 72.)]:
+        if size.endswith(unit):
+            return int(round(float(size[:-len(unit)]) / per_inch * dpi))
+    return int(round(float(size) * dpi))
+
+
+def terminal_font_size(font, default = 12):
+    """Extracts the font size from a gnuplot font specification (e.g. `"phv,12 "`).
+    """
+    try:
+        return float(str(font).split(",")[-1])
+    except ValueError:
+        return default
+
+
+def logscale_axes(gnuplot_lines):
+    """Axes (among `x`, `y`, `x2`, `y2`, `z`, `cb`) in logscale after executing the gnuplot commands in `gnuplot_lines`.
+
+    Parses `set logscale` and `unset logscale` (and their abbreviations, e.g. `set log xy`).
+    """
+    all_axes = ["x", "y", "z", "x2", "y2", "cb", "r"]
+    log_regex = re.compile(r"^\s*(set|unset)\s+log(?:s(?:c(?:a(?:l(?:e)?)?)?)?)?\b\s*([a-z0-9]*)")
+
+    axes = set()
+    for block in gnuplot_lines:
+        for line in str(block).split("\n"):
+            for command in line.split(";"):
+                m = log_regex.match(command)
+                if m is None:
+                    continue
+                spec = m.group(2)
+                # `set log 10` sets all the axes, as `set log`
+                if spec == "" or spec.isdigit():
+                    selected = set(all_axes)
+                else:
+                    selected = set(re.findall(r"x2|y2|cb|x|y|z|r", spec))
+                if m.group(1) == "set":
+                    axes |= selected
+                else:
+                    axes -= selected
+    return axes
@@ -0,0 +1,70 @@
+"""
+This file is part of Autognuplotpy, autogpy.
+
+Project-level build: a Makefile aggregating many figure folders.
+"""
+import os
+
+from . import autognuplot_terms
+from . import plot_helpers
+
+
+def find_figure_folders(root = "."):
+    """folders below `root` (included) containing autogpy figures, i.e. a
+    Makefile and at least one compile script. Sorted, relative to `root`.
+    """
+    folders = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        # skips hidden folders, e.g. the render cache and .git
+        dirnames[:] = sorted(d for d in dirnames if not d.startswith("."))
+        if "Makefile" in filenames and any(x.endswith("_compile.sh") for x in filenames):
+            folders.append(os.path.relpath(dirpath, root))
+    return [x for x in folders if x != "."]
+
+
+def write_project_makefile(root = ".", folders = None, fname = "Makefile"):
+    """Writes a Makefile in `root` building all the figure folders of a project.
+
+    Each folder is built by its own Makefile via `$(MAKE) -C`, hence `make -jN` in `root`
+    shares N jobs among all the figures of the project. Figures in the same folder can
+    be compiled concurrently, as their compile scripts have separate intermediate folders.
+
+    Parameters
+    ----------------
+    root: str, optional
+         (".") project folder.
+    folders: list of str or AutoGnuplotFigure, optional
+         (None) figure folders (or figures), relative to the current folder (as `folder_name`) or absolute.
+         If None, the folders below `root` are found via `find_figure_folders`.
+    fname: str, optional
+         ("Makefile") name of the Makefile, in `root`.
+
+    Returns
+    ----------------
+    path of the Makefile. It is rewritten only if its content changed.
+
+    Examples
+    ----------------
+    >>> autogpy.write_project_makefile("paper_figures")
+    >>> # then, from a shell: make -C paper_figures -j32
+    """
+    if folders is None:
+        folders = [os.path.join(root, x) for x in find_figure_folders(root)]
+
+    figure_dirs = []
+    for folder in folders:
+        folder = os.path.relpath(getattr(folder, 'folder_name', folder), root)
+        if folder not in figure_dirs:
+            figure_dirs.append(folder)
+
+    if "." in figure_dirs:
+        raise ValueError("the project Makefile would replace the one of the figure folder '%s'." % root)
+    if any(" " in x for x in figure_dirs):
+        raise ValueError("make does not support folder names with spaces: %s"
+                         % [x for x in figure_dirs if " " in x])
+
+    path = os.path.join(root, fname)
+    plot_helpers.write_if_changed(path, autognuplot_terms.MAKEFILE_PROJECT.format(
+        TAB = "\t"
+        , FIGURE_DIRS = " ".join(figure_dirs)))
+    return path
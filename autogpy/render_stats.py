@@ -0,0 +1,128 @@
+"""
+This file is part of Autognuplotpy, autogpy.
+
+Timing and I/O statistics of the figures: dataset serialization, script
+generation and the external tools run by the compile scripts.
+"""
+from collections import OrderedDict
+import os
+
+
+def parse_timings(fname):
+    """per-tool wall time (seconds) from the timestamps written by a compile
+    script, one `<tool> <epoch seconds>` line at the start of each step.
+
+    Each step lasts until the next timestamp; a step without a following
+    timestamp (the script failed) is left out. Returns an empty dict if
+    the file is missing or `date` does not support `%N` (e.g. BSD date).
+    """
+    if fname is None or not os.path.isfile(fname):
+        return OrderedDict()
+
+    stamps = []
+    with open(fname) as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) != 2:
+                continue
+            try:
+                stamps.append((parts[0], float(parts[1])))
+            except ValueError:
+                return OrderedDict()
+
+    tools = OrderedDict()
+    for (tool, start), (_, stop) in zip(stamps[:-1], stamps[1:]):
+        tools[tool] = tools.get(tool, 0.) + stop - start
+    return tools
+
+
+class RenderStats(object):
+    """Statistics collected by a figure (`fig.render_stats`).
+
+    Attributes
+    ---------------------
+    datasets: list of dict
+         one entry per dataset: `dataset_fname`, `storage` (`"file"`, `"store"`, `"inline"` or `"inplace"`),
+         `rows`, `columns`, `bytes` (as stored, 0 for arrays referenced in place) and `seconds` spent writing.
+    script: dict
+         `bytes` and `seconds` of the last generation of the core gnuplot script.
+    renders: OrderedDict
+         terminal -> dict with the `wall_time` of the last rendering and the per-`tools` wall times
+         (from the timestamps of the compile scripts, or of the gnuplot call).
+    """
+
+    def __init__(self):
+        self.datasets = []
+        self.script = {'bytes' : 0, 'seconds' : 0.}
+        self.renders = OrderedDict()
+
+    def add_dataset(self, dataset_fname, storage, rows, columns, n_bytes, seconds):
+        self.datasets.append({'dataset_fname' : dataset_fname
+                              , 'storage' : storage
+                              , 'rows' : rows
+                              , 'columns' : columns
+                              , 'bytes' : n_bytes
+                              , 'seconds' : seconds})
+
+    def set_script(self, n_bytes, seconds):
+        self.script = {'bytes' : n_bytes, 'seconds' : seconds}
+
+    def add_render(self, terminal, wall_time, tools = None):
+        self.renders[terminal] = {'wall_time' : wall_time
+                                  , 'tools' : OrderedDict(tools or {})}
+
+    def as_dict(self):
+        return {'datasets' : [dict(x) for x in self.datasets]
+                , 'script' : dict(self.script)
+                , 'renders' : OrderedDict((k, {'wall_time' : v['wall_time'], 'tools' : dict(v['tools'])})
+                                          for k, v in self.renders.items())}
+
+    def summary(self):
+        """totals of this figure, see `aggregate_render_stats`."""
+        return aggregate_render_stats([self])
+
+    def __repr__(self):
+        s = self.summary()
+        return "RenderStats(datasets=%d, bytes=%d, write=%.3fs, script=%.3fs, renders=%s)" % (
+            s['datasets']['count'], s['datasets']['bytes'], s['datasets']['seconds']
+            , s['script']['seconds'], list(self.renders))
+
+
+def aggregate_render_stats(figures):
+    """aggregates the `render_stats` of many figures (or `RenderStats` objects).
+
+    Returns a dict with:
+    - `figures`: number of figures;
+    - `datasets`: `count`, `rows`, `bytes` and `seconds` summed over all the datasets;
+    - `script`: `bytes` and `seconds` summed over the core scripts;
+    - `tools`: tool (or `"<terminal> wall"`) -> `count`, `total`, `mean` and `max` seconds.
+    """
+    stats = [getattr(x, 'render_stats', x) for x in figures]
+
+    datasets = {'count' : 0, 'rows' : 0, 'bytes' : 0, 'seconds' : 0.}
+    script = {'bytes' : 0, 'seconds' : 0.}
+    tool_times = OrderedDict()
+    for st in stats:
+        for ds in st.datasets:
+            datasets['count'] += 1
+            datasets['rows'] += ds['rows']
+            datasets['bytes'] += ds['bytes']
+            datasets['seconds'] += ds['seconds']
+        script['bytes'] += st.script['bytes']
+        script['seconds'] += st.script['seconds']
+        for terminal, render in st.renders.items():
+            tool_times.setdefault(terminal + " wall", []).append(render['wall_time'])
+            for tool, seconds in render['tools'].items():
+                tool_times.setdefault(tool, []).append(seconds)
+
+    tools = OrderedDict()
+    for tool, times in tool_times.items():
+        tools[tool] = {'count' : len(times)
+                       , 'total' : sum(times)
+                       , 'mean' : sum(times) / len(times)
+                       , 'max' : max(times)}
+
+    return {'figures' : len(stats)
+            , 'datasets' : datasets
+            , 'script' : script
+            , 'tools' : tools}
@@ -0,0 +1,154 @@
+"""
+This file is part of Autognuplotpy, autogpy.
+
+Evaluation and adaptive sampling of functions, used by `fplot`.
+"""
+import os
+import pickle
+import time
+import warnings
+
+import numpy as np
+
+# serial evaluations estimated to last longer than this (seconds) are run in a process pool
+POOL_MIN_SECONDS = 1.
+
+
+def _vectorized_call(foo, x):
+    """`foo(x)` as an array of the shape of `x`, or None if `foo` does not
+    support array arguments.
+    """
+    try:
+        with np.errstate(all = 'ignore'):
+            y = np.asarray(foo(x))
+    except Exception:
+        return None
+    if y.shape != x.shape or y.dtype == object:
+        return None
+    return y
+
+
+def _can_use_pool(foo):
+    """True if `foo` can be sent to the pool workers: picklable and, unless the workers
+    are forked, importable by them (i.e. not defined in `__main__`, such as a notebook).
+    """
+    if getattr(foo, "__module__", None) == "__main__":
+        import multiprocessing
+        # the first method is the default
+        start_method = (multiprocessing.get_start_method(allow_none = True)
+                        or multiprocessing.get_all_start_methods()[0])
+        if start_method != "fork":
+            return False
+    try:
+        pickle.dumps(foo)
+        return True
+    except Exception:
+        return False
+
+
+def evaluate(foo, x, n_jobs = None, vectorize = True):
+    """evaluates `foo` on the samples `x`.
+
+    A single vectorized call `foo(x)` is attempted first. Otherwise `foo` is
+    called on each sample, in a pool of `n_jobs` processes if `n_jobs > 1`
+    (serially, with a warning, if `foo` cannot be sent to the workers).
+    With `n_jobs = None`, the pool (of cpu count processes) is used when the
+    first call predicts a serial evaluation longer than `POOL_MIN_SECONDS`
+    and `foo` can be pickled (e.g. a module-level function, not a lambda), and
+    imported by the workers unless they are forked. The first value is reused.
+    """
+    x = np.asarray(x, dtype = float)
+    if len(x) == 0:
+        return np.empty(0)
+
+    if vectorize:
+        y = _vectorized_call(foo, x)
+        if y is not None:
+            return y
+
+    # values already computed, of the first samples
+    done = []
+    if n_jobs is None:
+        t0 = time.perf_counter()
+        done.append(foo(x[0]))
+        elapsed = time.perf_counter() - t0
+        n_jobs = 1
+        if elapsed * len(x) > POOL_MIN_SECONDS and _can_use_pool(foo):
+            n_jobs = os.cpu_count() or 1
+    elif n_jobs > 1 and not _can_use_pool(foo):
+        warnings.warn("%r cannot be sent to pool workers (lambdas, closures and, unless the workers are "
+                      "forked, functions defined in __main__ are not importable by them): "
+                      "evaluating serially." % (foo,))
+        n_jobs = 1
+
+    if n_jobs > 1:
+        # multiprocessing is slow to import
+        from concurrent.futures import ProcessPoolExecutor
+        todo = x[len(done):]
+        with ProcessPoolExecutor(max_workers = n_jobs) as executor:
+            chunksize = max(1, len(todo) // (4 * n_jobs))
+            return np.asarray(done + list(executor.map(foo, todo.tolist(), chunksize = chunksize)))
+
+    return np.asarray(done + [foo(xx) for xx in x[len(done):]])
+
+
+def _bending(x, y):
+    """distance of each interior point from the chord joining its neighbours,
+    in coordinates normalized to the extent of the curve. Non finite values
+    count as straight.
+    """
+    finite = np.isfinite(y)
+    x_span = x[-1] - x[0]
+    y_span = np.ptp(y[finite]) if finite.sum() > 1 else 0.
+    xn = (x - x[0]) / x_span
+    yn = (y - y[finite].min()) / y_span if y_span > 0 else np.zeros_like(y)
+
+    dx, dy = xn[2:] - xn[:-2], yn[2:] - yn[:-2]
+    cross = np.abs(dx * (yn[1:-1] - yn[:-2]) - dy * (xn[1:-1] - xn[:-2]))
+    with np.errstate(all = 'ignore'):
+        distance = cross / np.hypot(dx, dy)
+    return np.where(np.isfinite(distance), distance, 0.)
+
+
+def adaptive_sampling(foo, x, tol = 1e-3, max_points = 10000, n_jobs = None, vectorize = True):
+    """samples `foo` refining the initial samples `x` where the curve bends.
+
+    The intervals around each sample farther than `tol` from the chord
+    joining its neighbours are split in half. The distance is measured with
+    both axes normalized to the extent of the curve, hence `tol` is a
+    fraction of the figure size. The refinement stops when the curve is
+    within `tol` everywhere or when `max_points` samples are reached, in
+    which case the most bent intervals are split first. New samples are
+    evaluated in batches via `evaluate`.
+
+    Returns the sorted samples and the function values.
+    """
+    x = np.unique(np.asarray(x, dtype = float))
+    y = evaluate(foo, x, n_jobs, vectorize)
+
+    # intervals are not split below this width
+    min_width = (x[-1] - x[0]) * 2. ** -30
+
+    while len(x) < max_points and len(x) >= 3:
+        bending = _bending(x, y)
+        # interval i is [x[i], x[i+1]]: split if either endpoint is bent
+        interval_error = np.zeros(len(x) - 1)
+        interval_error[:-1] = bending
+        interval_error[1:] = np.maximum(interval_error[1:], bending)
+        interval_error[np.diff(x) < min_width] = 0.
+
+        to_split = np.flatnonzero(interval_error > tol)
+        if len(to_split) == 0:
+            break
+        budget = max_points - len(x)
+        if len(to_split) > budget:
+            to_split = to_split[np.argsort(interval_error[to_split])[::-1][:budget]]
+
+        x_new = .5 * (x[to_split] + x[to_split + 1])
+        y_new = evaluate(foo, x_new, n_jobs, vectorize)
+
+        order = np.argsort(np.concatenate([x, x_new]), kind = 'mergesort')
+        x = np.concatenate([x, x_new])[order]
+        y = np.concatenate([y, y_new])[order]
+
+    return x, y
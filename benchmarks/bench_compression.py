@@ -0,0 +1,54 @@
+"""Write time, size and decompression time of the compressed text datasets (`dataset_io.write_text(..., compress=...)`).
+
+The decompression uses the same command gnuplot runs through its pipe.
+
+Usage: python benchmarks/bench_compression.py [rows]   (default: 1e6)
+"""
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from autogpy import compression
+from autogpy import dataset_io
+
+
+def _time(foo):
+    t0 = time.perf_counter()
+    foo()
+    return time.perf_counter() - t0
+
+
+def main(n_rows = 10 ** 6):
+    x = np.linspace(0, 1, n_rows)
+    y = np.random.randn(n_rows)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        print("%8s %12s %10s %16s" % ("compress", "write [s]", "MB", "decompress [s]"))
+        for compress in [None] + list(compression.COMPRESSIONS):
+            fname = os.path.join(tmp, "data.dat" + compression.extension(compress))
+            try:
+                t_write = _time(lambda : dataset_io.write_text(fname, [x, y], compress = compress))
+            except RuntimeError as e:
+                print("%8s skipped: %s" % (compress, e))
+                continue
+            size_mb = os.path.getsize(fname) / 2. ** 20
+
+            if compress is None:
+                command = ["cat", fname]
+            else:
+                command = compression.COMPRESSIONS[compress][1].split() + [fname]
+            if shutil.which(command[0]) is None:
+                t_read = float("nan")
+            else:
+                t_read = _time(lambda : subprocess.run(command, stdout = subprocess.DEVNULL, check = True))
+
+            print("%8s %12.2f %10.1f %16.2f" % (compress, t_write, size_mb, t_read))
+
+
+if __name__ == "__main__":
+    main(int(float(sys.argv[1])) if len(sys.argv) > 1 else 10 ** 6)
@@ -0,0 +1,233 @@
+"""Microbenchmarks of script generation and dataset serialization. Neither gnuplot nor latex is required.
+
+Each benchmark reports the best wall time over a few repetitions. The
+results are stored as JSON, by default in `benchmarks/results/<commit>.json`,
+and can be compared against a previous run.
+
+Usage:
+    python benchmarks/bench_suite.py [--quick] [--filter SUBSTRING] [--output FILE] [--compare OLD.json]
+
+`--quick` limits the sizes (e.g. plots up to 1e5 rows), for a check in a few seconds.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+import autogpy
+
+BENCHMARKS = OrderedDict()
+
+
+def benchmark(name, repeat = 3, quick = True):
+    """registers a benchmark. The decorated function prepares the inputs and
+    returns a callable to time, run in a fresh temporary folder.
+    `quick = False` excludes it from `--quick` runs.
+    """
+    def register(setup):
+        BENCHMARKS[name] = {'setup' : setup, 'repeat' : repeat, 'quick' : quick}
+        return setup
+    return register
+
+
+def _figure(**kw):
+    return autogpy.Figure("bench_fig", file_identifier = "fig", **kw)
+
+
+def _xy(n_rows):
+    x = np.linspace(0, 1, n_rows)
+    return x, np.sin(x)
+
+
+### plot() serialization
+def _plot_rows(n_rows, **plot_kw):
+    def setup():
+        x, y = _xy(n_rows)
+        return lambda : _figure().plot(x, y, **plot_kw)
+    return setup
+
+for _exp in range(3, 8):
+    benchmark("plot_text_1e%d_rows" % _exp, repeat = 3 if _exp < 7 else 1, quick = _exp <= 5)(
+        _plot_rows(10 ** _exp))
+    benchmark("plot_binary_1e%d_rows" % _exp, repeat = 3 if _exp < 7 else 1, quick = _exp <= 5)(
+        _plot_rows(10 ** _exp, data_format = "binary"))
+
+
+@benchmark("plot_allow_strings_1e4_rows")
+def _plot_allow_strings():
+    try:
+        import pandas
+    except ImportError:
+        return None
+    x, y = _xy(10 ** 4)
+    labels = ["p%d" % i for i in range(len(x))]
+    return lambda : _figure().plot("u 1:2:3 w labels", x, y, labels, allow_strings = True)
+
+
+### script generation
+def _multiplot(n_panels):
+    def setup():
+        x, y = _xy(100)
+        def run():
+            fig = _figure(data_storage = "inline")
+            fig.set_multiplot("layout %d,10" % (n_panels // 10))
+            for i in range(n_panels):
+                if i:
+                    fig.next_multiplot_group()
+                fig.alter_current_multiplot_parameters(r"set title 'panel %d'" % i)
+                fig.plot("w l", x, i * y)
+            fig.get_gnuplot_file_content()
+        return run
+    return setup
+
+benchmark("multiplot_100_panels")(_multiplot(100))
+benchmark("multiplot_500_panels", repeat = 1, quick = False)(_multiplot(500))
+
+
+@benchmark("set_unset_2000_preamble")
+def _set_unset():
+    def run():
+        fig = _figure()
+        for i in range(1000):
+            fig.set("xrange [0:%d]" % (i + 1))
+            fig.unset("key")
+        fig.get_gnuplot_file_content()
+    return run
+
+
+@benchmark("fit_inference_200_calls")
+def _fit():
+    x, y = _xy(100)
+    def run():
+        fig = _figure()
+        # fit reports the inferred names on stdout
+        with contextlib.redirect_stdout(io.StringIO()):
+            for i in range(200):
+                fig.fit("f%d(x)=a%d*x**2+b%d*x+c%d" % (i, i, i, i), x, y)
+    return run
+
+
+@benchmark("generate_gnuplot_file_50_datasets")
+def _generate():
+    x, y = _xy(1000)
+    def run():
+        fig = _figure()
+        fig.set("xrange [0:1]")
+        for i in range(50):
+            fig.plot("w l", x, i * y)
+        fig.generate_gnuplot_file()
+    return run
+
+
+### figure construction
+@benchmark("construct_10k_figures")
+def _construct():
+    def run():
+        for i in range(10000):
+            autogpy.Figure("bench_fig", file_identifier = "fig%d" % i)
+    return run
+
+
+@benchmark("allocate_10k_figure_objects")
+def _allocate():
+    # baseline of construct_10k_figures: the same instance attributes, without __init__
+    state = autogpy.Figure("bench_fig", file_identifier = "fig").__dict__
+    def run():
+        for i in range(10000):
+            fig = object.__new__(autogpy.Figure)
+            fig.__dict__.update(state)
+            fig.file_identifier = "fig%d" % i
+    return run
+
+
+def _run(name, spec):
+    """best of `repeat` runs, in seconds (None if skipped)."""
+    with tempfile.TemporaryDirectory() as tmp:
+        cwd = os.getcwd()
+        os.chdir(tmp)
+        try:
+            foo = spec['setup']()
+            if foo is None:
+                return None
+            times = []
+            for _ in range(spec['repeat']):
+                t0 = time.perf_counter()
+                foo()
+                times.append(time.perf_counter() - t0)
+            return min(times)
+        finally:
+            os.chdir(cwd)
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"]
+                                       , cwd = os.path.dirname(os.path.abspath(__file__))
+                                       , stderr = subprocess.DEVNULL
+                                       , universal_newlines = True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(old, new):
+    """prints the ratio of the timings of two result dicts."""
+    print("%-36s %12s %12s %8s" % ("benchmark", "old [s]", "new [s]", "ratio"))
+    for name, result in new['results'].items():
+        old_result = old['results'].get(name)
+        if old_result is None or old_result['seconds'] is None or result['seconds'] is None:
+            continue
+        print("%-36s %12.4f %12.4f %8.2f" % (name, old_result['seconds'], result['seconds']
+                                             , result['seconds'] / old_result['seconds']))
+
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = __doc__.splitlines()[0])
+    parser.add_argument("--quick", action = "store_true")
+    parser.add_argument("--filter", default = "")
+    parser.add_argument("--output", default = None)
+    parser.add_argument("--compare", default = None)
+    args = parser.parse_args(argv)
+
+    commit = _git_commit()
+    output = args.output or os.path.join(os.path.dirname(os.path.abspath(__file__))
+                                         , "results", "%s.json" % (commit or "unknown"))
+
+    results = OrderedDict()
+    for name, spec in BENCHMARKS.items():
+        if args.filter not in name or (args.quick and not spec['quick']):
+            continue
+        seconds = _run(name, spec)
+        results[name] = {'seconds' : seconds, 'repeat' : spec['repeat']}
+        print("%-36s %s" % (name, "skipped" if seconds is None else "%.4f s" % seconds))
+        sys.stdout.flush()
+
+    run = {'meta' : {'commit' : commit
+                     , 'date' : time.strftime("%Y-%m-%dT%H:%M:%S")
+                     , 'python' : platform.python_version()
+                     , 'numpy' : np.__version__
+                     , 'platform' : platform.platform()
+                     , 'quick' : args.quick}
+           , 'results' : results}
+
+    if os.path.dirname(output) and not os.path.exists(os.path.dirname(output)):
+        os.makedirs(os.path.dirname(output))
+    with open(output, "w") as f:
+        json.dump(run, f, indent = 1)
+    print("results written to", output)
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), run)
+
+
+if __name__ == "__main__":
+    main()
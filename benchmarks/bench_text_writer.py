@@ -0,0 +1,41 @@
+"""Throughput of the text dataset writer (`dataset_io.write_text`) against `np.savetxt`.
+
+Usage: python benchmarks/bench_text_writer.py [max_rows]   (default: 1e7)
+"""
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from autogpy import dataset_io
+
+
+def _time(foo):
+    t0 = time.perf_counter()
+    foo()
+    return time.perf_counter() - t0
+
+
+def main(max_rows = 10 ** 7):
+    n_rows = 10 ** 6
+    with tempfile.TemporaryDirectory() as tmp:
+        fname = os.path.join(tmp, "data.dat")
+        print("%12s %12s %12s %14s %8s" % ("rows", "MB", "savetxt [s]", "write_text [s]", "speedup"))
+        while n_rows <= max_rows:
+            x = np.linspace(0, 1, n_rows)
+            y = np.random.randn(n_rows)
+
+            t_savetxt = _time(lambda : np.savetxt(fname, np.concatenate(
+                [x[:, np.newaxis], y[:, np.newaxis]], axis = 1)))
+            t_write_text = _time(lambda : dataset_io.write_text(fname, [x, y]))
+            size_mb = os.path.getsize(fname) / 2. ** 20
+
+            print("%12d %12.1f %12.2f %14.2f %8.2f" % (n_rows, size_mb, t_savetxt
+                                                        , t_write_text, t_savetxt / t_write_text))
+            n_rows *= 10
+
+
+if __name__ == "__main__":
+    main(int(float(sys.argv[1])) if len(sys.argv) > 1 else 10 ** 7)
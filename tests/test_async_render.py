@@ -0,0 +1,109 @@
+import asyncio
+import time
+
+import autogpy
+from autogpy import async_render
+import numpy as np
+import pytest
+
+XX_test_linspace = np.linspace(0, 1, 50)
+
+
+def _figures(n, script):
+    figs = []
+    for i in range(n):
+        fig = autogpy.Figure("test_plot_%d" % i, file_identifier="fig%d" % i)
+        fig.plot(XX_test_linspace, i * XX_test_linspace)
+        # stands in for the compile script
+        fig.get_render_command = lambda terminal, i=i: {
+            'command': ["bash", "-c", script.format(i=i)],
+            'cwd': ".", 'output': "out%d.png" % i, 'preview': None}
+        figs.append(fig)
+    return figs
+
+
+def test_render_async_bytes(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    fig, = _figures(1, "printf 'image {i}' > out{i}.png")
+
+    result = asyncio.run(fig.render_async(terminal="pngcairo", return_bytes=True))
+    assert result.status == "ok"
+    assert result.output == b"image 0"
+    assert "pngcairo" in fig.render_stats.renders
+
+
+def test_render_many_async_concurrent(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    figs = _figures(4, "sleep 0.5; echo rendered {i}")
+
+    t0 = time.time()
+    results = asyncio.run(async_render.render_many_async(figs, max_concurrency=4))
+    assert time.time() - t0 < 1.5
+
+    assert [r.figure for r in results] == figs
+    for i, r in enumerate(results):
+        assert r.status == "ok" and r.stdout == "rendered %d\n" % i
+        assert r.output == "out%d.png" % i
+
+
+def test_render_async_errors_and_cancellation(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    failing, slow = _figures(2, "sleep 30; exit {i}")
+    failing.get_render_command = lambda terminal: {
+        'command': ["/nonexistent/gnuplot"], 'cwd': ".",
+        'output': None, 'preview': None}
+
+    async def main():
+        result = await failing.render_async(return_bytes=True)
+        assert result.status == "error" and result.output is None
+
+        task = asyncio.ensure_future(slow.render_async())
+        await asyncio.sleep(.5)
+        task.cancel()
+        t0 = time.time()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        assert time.time() - t0 < 5
+
+    asyncio.run(main())
+
+
+def test_render_many_async_generation_errors(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    figs = _figures(2, "printf 'image {i}' > out{i}.png")
+
+    def _fail():
+        raise OSError("disk full")
+    figs[0].generate_gnuplot_file = _fail
+
+    results = asyncio.run(async_render.render_many_async(figs, return_bytes=True))
+    assert results[0].status == "error" and "disk full" in results[0].stderr
+    assert results[1].status == "ok" and results[1].output == b"image 1"
+
+
+def test_generation_does_not_block_the_loop(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    fig, = _figures(1, "echo rendered {i}")
+    generate = fig.generate_gnuplot_file
+
+    def _slow_generate():
+        time.sleep(.5)
+        generate()
+    fig.generate_gnuplot_file = _slow_generate
+
+    async def main():
+        ticks = []
+
+        async def ticker():
+            while True:
+                ticks.append(time.time())
+                await asyncio.sleep(.05)
+
+        task = asyncio.ensure_future(ticker())
+        result = await fig.render_async()
+        task.cancel()
+        return result, ticks
+
+    result, ticks = asyncio.run(main())
+    assert result.status == "ok"
+    assert len(ticks) >= 5
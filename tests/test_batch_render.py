@@ -0,0 +1,68 @@
+import autogpy
+import numpy as np
+
+XX_test_linspace = np.linspace(0, 1, 50)
+
+
+def _figures(n):
+    figs = []
+    for i in range(n):
+        fig = autogpy.Figure("test_plot_%d" % (i % 2), file_identifier="fig%d" % i)
+        fig.plot(XX_test_linspace, i * XX_test_linspace)
+        figs.append(fig)
+    return figs
+
+
+def test_render_many_results(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    figs = _figures(4)
+    for i, fig in enumerate(figs):
+        # stands in for the compile script
+        fig.get_render_command = lambda terminal, i=i: {
+            'command': ["bash", "-c", "echo rendered %d; echo warn >&2" % i],
+            'cwd': ".", 'output': "out%d" % i, 'preview': None}
+
+    results = autogpy.render_many(figs, max_workers=3)
+
+    assert [r.figure for r in results] == figs
+    for i, r in enumerate(results):
+        assert r.status == "ok"
+        assert r.stdout == "rendered %d\n" % i
+        assert r.stderr == "warn\n"
+        assert set(r.timings) == {"generate", "render"}
+    # scripts have been generated
+    assert (tmp_path / "test_plot_1" / "fig3__.core.gnu").exists()
+
+
+def test_render_many_reports_errors(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    figs = _figures(2)
+    figs[1].get_render_command = lambda terminal: {
+        'command': ["bash", "-c", "exit 3"], 'cwd': ".",
+        'output': None, 'preview': None}
+    figs[0].get_render_command = lambda terminal: {
+        'command': ["/nonexistent/gnuplot"], 'cwd': ".",
+        'output': None, 'preview': None}
+
+    results = autogpy.render_many(figs)
+    assert results[1].status == "error" and results[1].returncode == 3
+    assert results[0].status == "error" and results[0].stderr
+
+
+def test_render_many_reports_generation_errors(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    figs = _figures(3)
+    for i, fig in enumerate(figs):
+        fig.get_render_command = lambda terminal, i=i: {
+            'command': ["bash", "-c", "echo rendered %d" % i],
+            'cwd': ".", 'output': "out%d" % i, 'preview': None}
+
+    def _fail():
+        raise OSError("disk full")
+    figs[1].generate_gnuplot_file = _fail
+
+    results = autogpy.render_many(figs)
+    assert [r.status for r in results] == ["ok", "error", "ok"]
+    assert "disk full" in results[1].stderr
+    assert results[1].returncode is None and results[1].output is None
+    assert results[2].stdout == "rendered 2\n"
@@ -0,0 +1,41 @@
+import autogpy
+from autogpy import plot_helpers
+import numpy as np
+import pytest
+
+XX_test_linspace = np.linspace(0, 1, 50)
+
+
+def test_terminal_size_to_pixels():
+    assert plot_helpers.terminal_size_to_pixels("2.54cm", 100) == 100
+    assert plot_helpers.terminal_size_to_pixels("9.9cm", 100) == 390
+    assert plot_helpers.terminal_size_to_pixels("3in", 100) == 300
+    assert plot_helpers.terminal_size_to_pixels("5", 100) == 500
+
+
+def test_cairo_wrappers_keep_figure_size(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    fig = autogpy.Figure("test_plot", file_identifier="figtest",
+                         jpg_convert_density=200)
+    fig.set_figure_size(x_size="2.54cm", y_size="1.27cm")
+    fig.plot(XX_test_linspace)
+    fig.generate_gnuplot_file()
+
+    png_wrapper = (tmp_path / "test_plot" / "figtest__.pngcairo.gnu").read_text()
+    assert "set terminal pngcairo size 200,100" in png_wrapper
+    assert "font ',12'" in png_wrapper
+    assert "set output 'figtest__.pngcairo.png'" in png_wrapper
+    assert 'load "figtest__.core.gnu"' in png_wrapper
+
+    pdf_wrapper = (tmp_path / "test_plot" / "figtest__.pdfcairo.gnu").read_text()
+    assert "set terminal pdfcairo size 2.54cm,1.27cm" in pdf_wrapper
+
+    command = fig.get_render_command("pngcairo")
+    assert command['command'] == ["gnuplot", "figtest__.pngcairo.gnu"]
+    assert command['preview'].endswith("figtest__.pngcairo.png")
+
+
+def test_preview_mode_validated(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    with pytest.raises(ValueError):
+        autogpy.Figure("test_plot", preview_mode="svg")
@@ -0,0 +1,271 @@
+import autogpy
+import numpy as np
+import os
+import pytest
+import shutil
+import subprocess
+
+XX_test_linspace = np.linspace(0, 1, 50)
+
+
+def test_binary_dataset_float64(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    with autogpy.Figure("test_plot", file_identifier="figtest",
+                        data_format="binary") as fig:
+        fig.plot(XX_test_linspace, XX_test_linspace ** 2)
+
+    fcontent = fig.get_gnuplot_file_content()
+    assert ('"figtest__0__.bin" binary format="%double%double" '
+            'record=50 endian=little') in fcontent
+
+    data = np.fromfile("test_plot/figtest__0__.bin", dtype="<f8")
+    assert data.size == 100
+    assert np.allclose(data.reshape(-1, 2)[:, 1], XX_test_linspace ** 2)
+
+
+def test_binary_dataset_per_call_float32(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    with autogpy.Figure("test_plot", file_identifier="figtest") as fig:
+        fig.plot(XX_test_linspace)
+        fig.plot('u 1:2 w l', XX_test_linspace, XX_test_linspace,
+                 data_format="binary32")
+
+    fcontent = fig.get_gnuplot_file_content()
+    assert '"figtest__0__.dat"' in fcontent
+    assert ('"figtest__1__.bin" binary format="%float%float" '
+            'record=50 endian=little u 1:2 w l') in fcontent
+    assert os.path.getsize("test_plot/figtest__1__.bin") == 50 * 2 * 4
+
+
+def test_binary_dataset_fit(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    with autogpy.Figure("test_plot", file_identifier="figtest") as fig:
+        fig.fit("f(x)=a*x+b", XX_test_linspace, XX_test_linspace,
+                data_format="binary")
+
+    fcontent = fig.get_gnuplot_file_content()
+    assert 'fit f(x) "figtest__0__fit.bin" binary format="%double%double"' \
+        in fcontent
+
+
+def test_hist_dump_npy(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    samples = np.random.randn(1000)
+    with autogpy.Figure("test_plot", file_identifier="figtest") as fig:
+        fig.hist_generic(samples, "w l", dump_data=True,
+                         dump_data_format="npy")
+
+    dumped = np.load("test_plot/figtest__0__.dat.hist_compl_dump.npy")
+    assert np.array_equal(dumped, samples)
+
+
+def test_dataset_store_shared_between_figures(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    store = autogpy.DatasetStore("project/datasets")
+
+    figs = []
+    for name in ["fig_a", "fig_b"]:
+        with autogpy.Figure("project/" + name, file_identifier="figtest",
+                            dataset_store=store) as fig:
+            fig.plot(XX_test_linspace, XX_test_linspace ** 2)
+        figs.append(fig)
+
+    stored = os.listdir("project/datasets")
+    assert len(stored) == 1
+    assert not os.path.exists("project/fig_a/figtest__0__.dat")
+
+    for fig in figs:
+        fcontent = fig.get_gnuplot_file_content()
+        assert '"../datasets/%s"' % stored[0] in fcontent
+        # titles are still derived from the per-figure name
+        assert 'title "figtest\\\\_0\\\\_.dat"' in fcontent
+
+
+def test_dataset_store_skips_existing(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    fig = autogpy.Figure("test_plot", file_identifier="figtest",
+                         dataset_store=True)
+    fig.plot(XX_test_linspace)
+    path = fig.dataset_store.store([XX_test_linspace])
+    os.utime(path, (0, 0))
+
+    fig.plot(XX_test_linspace)
+    assert os.path.getmtime(path) == 0
+    assert fig.datasets_to_plot[0][0]['dataset_fname'] \
+        == fig.datasets_to_plot[0][1]['dataset_fname']
+
+
+def test_dataset_store_owns_only_its_files(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    fig = autogpy.Figure("test_plot", file_identifier="figtest",
+                         dataset_store=True)
+    store = fig.dataset_store
+    assert store.owns(store.store([XX_test_linspace], compress="gz"))
+    assert store.owns(store.store([XX_test_linspace], data_format="binary"))
+    # other files of the figure folder are not content-addressed
+    assert not store.owns("test_plot/figtest__0__.dat")
+    assert not store.owns("test_plot/ds_notadigest.dat")
+    assert not store.owns(os.path.join("elsewhere", os.path.basename(
+        store.store([XX_test_linspace]))))
+
+
+def test_dataset_store_follows_umask(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    store = autogpy.dataset_io.DatasetStore("store")
+    umask = os.umask(0o022)
+    try:
+        path = store.store([XX_test_linspace], data_format="binary")
+    finally:
+        os.umask(umask)
+    assert os.stat(path).st_mode & 0o777 == 0o644
+    assert os.listdir("store") == [os.path.basename(path)]
+
+
+@pytest.mark.parametrize("data_format", ["text", "binary"])
+def test_mismatched_column_lengths(tmp_path, monkeypatch, data_format):
+    monkeypatch.chdir(tmp_path)
+    with pytest.raises(ValueError, match="3, 4"):
+        autogpy.dataset_io.write_dataset("written.dat", [np.arange(3), np.arange(4)],
+                                         data_format)
+    fig = autogpy.Figure("test_plot", file_identifier="figtest")
+    with pytest.raises(ValueError, match="3, 4"):
+        fig.plot(np.arange(3), np.arange(4), data_format=data_format)
+    with pytest.raises(ValueError):
+        autogpy.dataset_io.estimate_text_size([np.arange(3), np.ones((4, 2))])
+
+
+def test_text_size_estimate_is_an_upper_bound(tmp_path):
+    # the longest values
+    extremes = np.array([-np.finfo(np.float64).max, -np.finfo(np.float64).tiny] * 50)
+    columns = [extremes, extremes[::-1]]
+    fname = str(tmp_path / "extremes.dat")
+    autogpy.dataset_io.write_text(fname, columns)
+    assert os.path.getsize(fname) <= autogpy.dataset_io.estimate_text_size(columns)
+
+
+def test_text_writer_matches_savetxt(tmp_path):
+    columns = [np.random.randn(1000), np.arange(1000),
+               np.random.rand(1000, 3).astype(np.float32)]
+    reference = tmp_path / "reference.dat"
+    np.savetxt(str(reference), np.concatenate(
+        autogpy.dataset_io.as_columns(columns), axis=1))
+
+    written = tmp_path / "written.dat"
+    # small blocks, to exercise the block boundaries
+    autogpy.dataset_io.write_text(str(written), columns, block_rows=77)
+    assert written.read_bytes() == reference.read_bytes()
+
+
+def test_binary_writer_blocks(tmp_path):
+    x, y = np.random.randn(1000), np.random.randn(1000)
+    fname = str(tmp_path / "written.bin")
+    autogpy.dataset_io.write_binary(fname, [x, y], block_rows=77)
+    data = np.fromfile(fname, dtype="<f8").reshape(-1, 2)
+    assert np.array_equal(data, np.column_stack([x, y]))
+
+
+def test_compressed_dataset_gz(tmp_path, monkeypatch):
+    import gzip
+    monkeypatch.chdir(tmp_path)
+    with autogpy.Figure("test_plot", file_identifier="figtest",
+                        compress="gz") as fig:
+        fig.plot(XX_test_linspace, XX_test_linspace ** 2)
+
+    fcontent = fig.get_gnuplot_file_content()
+    assert '"< gzip -dc \'figtest__0__.dat.gz\'"' in fcontent
+
+    with gzip.open("test_plot/figtest__0__.dat.gz") as f:
+        data = np.loadtxt(f)
+    assert np.allclose(data[:, 1], XX_test_linspace ** 2)
+
+
+def test_compressed_text_writer_blocks(tmp_path):
+    import gzip
+    x = np.random.randn(1000)
+    reference = tmp_path / "reference.dat"
+    np.savetxt(str(reference), x)
+
+    written = tmp_path / "written.dat.gz"
+    # several gzip members, one per block
+    autogpy.dataset_io.write_text(str(written), [x], block_rows=77,
+                                  compress="gz")
+    assert gzip.decompress(written.read_bytes()) == reference.read_bytes()
+
+
+def test_compressed_binary_not_supported(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    fig = autogpy.Figure("test_plot", file_identifier="figtest")
+    with pytest.raises(ValueError):
+        fig.plot(XX_test_linspace, data_format="binary", compress="gz")
+
+
+@pytest.mark.parametrize("compress, tool", [("zstd", "zstd"), ("lz4", "lz4")])
+def test_compressed_dataset_zstd_lz4(tmp_path, monkeypatch, compress, tool):
+    if shutil.which(tool) is None:
+        pytest.skip("%s not available" % tool)
+    monkeypatch.chdir(tmp_path)
+    x = np.random.randn(1000)
+    np.savetxt("reference.dat", x)
+    fname = "written.dat" + autogpy.compression.extension(compress)
+    autogpy.dataset_io.write_text(fname, [x], block_rows=77,
+                                  compress=compress)
+    out = subprocess.check_output([tool, "-dcq", fname])
+    with open("reference.dat", "rb") as f:
+        assert out == f.read()
+
+
+def test_npy_referenced_in_place(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    data = np.column_stack([XX_test_linspace, XX_test_linspace ** 2])
+    np.save("data.npy", data)
+    with autogpy.Figure("test_plot", file_identifier="figtest") as fig:
+        fig.plot("data.npy")
+        fig.plot("u 1:2 w l", np.load("data.npy", mmap_mode="r")[5:])
+
+    fcontent = fig.get_gnuplot_file_content()
+    assert ('"../data.npy" binary skip=128 format="%double%double" '
+            'record=50 endian=little') in fcontent
+    # slices are referenced at their offset
+    assert '"../data.npy" binary skip=208 ' in fcontent
+    assert not [x for x in os.listdir("test_plot") if x.endswith(".dat")]
+
+
+def test_npz_and_fortran_memmap_converted(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    np.savez("data.npz", x=XX_test_linspace, y=XX_test_linspace ** 2)
+    np.save("fortran.npy", np.asfortranarray(
+        np.column_stack([XX_test_linspace, -XX_test_linspace])))
+    with autogpy.Figure("test_plot", file_identifier="figtest") as fig:
+        fig.plot("u 1:2", "data.npz")
+        fig.plot("u 1:2", "fortran.npy")
+
+    data = np.loadtxt("test_plot/figtest__0__.dat")
+    assert np.allclose(data[:, 1], XX_test_linspace ** 2)
+    data = np.loadtxt("test_plot/figtest__1__.dat")
+    assert np.allclose(data[:, 1], -XX_test_linspace)
+
+
+def test_inline_datablocks(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    with autogpy.Figure("test_plot", file_identifier="figtest",
+                        data_storage="inline") as fig:
+        fig.inline_max_bytes = 10000
+        for i in range(3):
+            fig.plot("u 1:2 w l", XX_test_linspace, XX_test_linspace ** i)
+        # too large: spilled to a file
+        fig.plot("u 1:2 w l", np.arange(1000), np.arange(1000))
+
+    fcontent = fig.get_gnuplot_file_content()
+    assert fcontent.count(" << EOD\n") == 3
+    assert "$DATA_0 << EOD\n0.000000000000000000e+00 1.000000000000000000e+00\n" \
+        in fcontent
+    assert "$DATA_1 u 1:2 w l" in fcontent
+    assert 'title "figtest\\\\_0\\\\_.dat"' in fcontent
+    # datablocks precede their use
+    assert fcontent.index("$DATA_0 << EOD") < fcontent.index("$DATA_0 u 1:2")
+    assert '"figtest__3__.dat" u 1:2 w l' in fcontent
+
+    dat_files = [x for x in os.listdir("test_plot") if x.endswith(".dat")]
+    assert dat_files == ["figtest__3__.dat"]
+    with open("test_plot/figtest__.deps.mk") as f:
+        assert "$DATA" not in f.read()
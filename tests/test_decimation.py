@@ -0,0 +1,67 @@
+import autogpy
+from autogpy import decimation
+from autogpy.plot_helpers import logscale_axes
+import numpy as np
+import pytest
+
+TT = np.linspace(0, 10, 200000)
+YY = np.sin(TT) + 0.1 * np.random.RandomState(0).randn(TT.size)
+
+
+def test_minmax_keeps_extremes():
+    idx = decimation.minmax_indices(TT, YY, 500)
+    assert len(idx) <= 2 * 500 + 2
+    assert idx[0] == 0 and idx[-1] == TT.size - 1
+    assert np.all(np.diff(idx) > 0)
+    assert YY[idx].max() == YY.max() and YY[idx].min() == YY.min()
+
+
+def test_lttb_size_and_endpoints():
+    idx = decimation.lttb_indices(TT, YY, 1000)
+    assert len(idx) == 1000
+    assert idx[0] == 0 and idx[-1] == TT.size - 1
+    assert np.all(np.diff(idx) > 0)
+
+
+def test_short_series_untouched():
+    assert np.array_equal(decimation.lttb_indices(TT[:10], YY[:10], 100),
+                          np.arange(10))
+    assert np.array_equal(decimation.minmax_indices(TT[:10], YY[:10], 100),
+                          np.arange(10))
+
+
+def test_log_space_decimation():
+    x = np.logspace(-3, 3, 100000)
+    x[:10] = -1.  # not shown on log axes
+    idx = decimation.decimation_indices(x, np.cos(x), "minmax", 100, logx=True)
+    assert np.all(x[idx] > 0)
+    # buckets equally spaced in log space: each decade gets samples
+    decades = np.floor(np.log10(x[idx]))
+    assert set(decades) == {-3, -2, -1, 0, 1, 2, 3}
+
+
+def test_logscale_axes_parsing():
+    assert logscale_axes(["set logscale y"]) == {"y"}
+    assert logscale_axes(["set log xy", "unset log x"]) == {"y"}
+    assert logscale_axes(["set logscale x 2"]) == {"x"}
+    assert "x" in logscale_axes(["set log"])
+    assert logscale_axes(["set logistic", "# set log x"]) == set()
+
+
+def test_plot_decimate(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    with autogpy.Figure("test_plot", file_identifier="figtest") as fig:
+        fig.set("logscale y")
+        fig.plot(TT, YY, decimate="minmax", decimate_points=300)
+        fig.plot(TT, YY, decimate="lttb")
+
+    minmax_data = np.loadtxt("test_plot/figtest__0__.dat")
+    assert len(minmax_data) <= 2 * 300 + 2
+    assert np.all(minmax_data[:, 1] > 0)
+
+    lttb_data = np.loadtxt("test_plot/figtest__1__.dat")
+    n_pixels = autogpy.plot_helpers.terminal_size_to_pixels("9.9cm", 300)
+    assert len(lttb_data) <= 2 * n_pixels
+
+    with pytest.raises(ValueError):
+        fig.plot(YY, decimate="minmax")
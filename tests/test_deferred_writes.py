@@ -0,0 +1,55 @@
+import autogpy
+from autogpy import dataset_io
+import numpy as np
+import pytest
+
+XX_test_linspace = np.linspace(0, 1, 1000)
+
+
+def test_deferred_writes_same_files(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    for folder, deferred in [("test_plot_sync", False), ("test_plot_deferred", True)]:
+        with autogpy.Figure(folder, file_identifier="figtest", deferred_writes=deferred) as fig:
+            fig.plot(XX_test_linspace, XX_test_linspace ** 2)
+            fig.plot(XX_test_linspace, XX_test_linspace ** 3, data_format="binary32")
+            fig.plot(XX_test_linspace, np.sin(XX_test_linspace), compress="gz")
+
+    for fname in ["figtest__0__.dat", "figtest__1__.bin", "figtest__2__.dat.gz"]:
+        with open("test_plot_sync/" + fname, "rb") as f_sync, \
+             open("test_plot_deferred/" + fname, "rb") as f_deferred:
+            assert f_sync.read() == f_deferred.read()
+    assert len(fig.render_stats.datasets) == 3
+
+
+def test_deferred_writes_snapshot(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    y = XX_test_linspace.copy()
+    fig = autogpy.Figure("test_plot", file_identifier="figtest", deferred_writes=True)
+    fig.plot(XX_test_linspace, y)
+    y[:] = -1
+    fig.generate_gnuplot_file()
+
+    data = np.loadtxt("test_plot/figtest__0__.dat")
+    assert np.allclose(data[:, 1], XX_test_linspace)
+
+
+def test_deferred_writes_error_at_generate(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    write_dataset = dataset_io.write_dataset
+
+    def failing_write(fname, args, data_format="text", compress=None):
+        if data_format == "binary":
+            raise OSError("disk full")
+        return write_dataset(fname, args, data_format, compress)
+
+    monkeypatch.setattr(dataset_io, "write_dataset", failing_write)
+
+    fig = autogpy.Figure("test_plot", file_identifier="figtest", deferred_writes=True)
+    fig.plot(XX_test_linspace)
+    fig.plot(XX_test_linspace, data_format="binary")
+
+    with pytest.raises(dataset_io.DatasetWriteError) as excinfo:
+        fig.generate_gnuplot_file()
+    assert "figtest__1__.bin" in str(excinfo.value)
+    assert "figtest__0__" not in str(excinfo.value)
+    assert isinstance(excinfo.value.__cause__, OSError)
@@ -0,0 +1,96 @@
+import autogpy
+import numpy as np
+import os
+import pytest
+import stat
+
+XX_test_linspace = np.linspace(0, 1, 50)
+
+
+def _model_figure():
+    fig = autogpy.Figure("test_plot", file_identifier="figtest")
+    fig.add_variable_declaration("D", 1)
+    fig.set_multiplot("layout 1,2")
+    fig.alter_current_multiplot_parameters("set title sprintf('D = %g', D)")
+    fig.plot("w l", XX_test_linspace, XX_test_linspace)
+    fig.next_multiplot_group()
+    fig.plot(XX_test_linspace, XX_test_linspace ** 2, data_format="binary")
+    fig.plot("x**2 w l")
+    return fig
+
+
+def test_template_script(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    template = autogpy.FigureTemplate(_model_figure(), variables=["D"])
+    for D in [.5, 2]:
+        template.add_instance((XX_test_linspace, D * XX_test_linspace),
+                              (XX_test_linspace, XX_test_linspace ** D),
+                              variables={"D": D})
+
+    content = template.get_gnuplot_file_content("pngcairo")
+    assert "array AUTOGPY_VAR_D[2] = [0.5, 2]" in content
+    assert "do for [AUTOGPY_I=0:1] {" in content
+    assert 'set output sprintf("figtest__inst%d.png", AUTOGPY_I)' in content
+    assert "D=AUTOGPY_VAR_D[AUTOGPY_I+1]" in content
+    assert 'p  sprintf("figtest__inst%d__0__.dat", AUTOGPY_I) w l' in content
+    # the binary clause of the model dataset is dropped
+    assert 'p  sprintf("figtest__inst%d__1__.dat", AUTOGPY_I)  title' in content
+    assert "binary" not in content
+    assert "unset multiplot" in content
+
+    data = np.loadtxt("test_plot/figtest__inst1__1__.dat")
+    assert np.allclose(data[:, 1], XX_test_linspace ** 2)
+
+
+def test_template_resets_each_instance(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    fig = _model_figure()
+    fig.alter_current_multiplot_parameters("set key above")
+    template = autogpy.FigureTemplate(fig)
+    template.add_instance((XX_test_linspace,), (XX_test_linspace,))
+
+    lines = template.get_gnuplot_file_content().splitlines()
+    loop = lines.index("do for [AUTOGPY_I=0:0] {")
+    assert lines[loop + 1] == "reset"
+    # the group-1 alteration is only set after the group-0 plot
+    body = lines[loop + 1:]
+    plot_0 = next(i for i, line in enumerate(body) if "figtest__inst%d__0__.dat" in line)
+    assert body.index("set key above") > plot_0
+
+
+def test_template_checks_bindings(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    template = autogpy.FigureTemplate(_model_figure(), variables=["D"])
+    with pytest.raises(ValueError):
+        template.add_instance((XX_test_linspace,), variables={"D": 1})
+    with pytest.raises(ValueError):
+        template.add_instance((XX_test_linspace,), (XX_test_linspace,))
+    with pytest.raises(ValueError):
+        template.get_gnuplot_file_content()
+
+
+def test_template_single_gnuplot_call(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    # stands in for gnuplot: logs its calls and writes the outputs
+    fake = bin_dir / "gnuplot"
+    fake.write_text("#!/bin/sh\necho \"$1\" >> %s\nfor i in 0 1 2; do touch figtest__inst$i.pdf; done\n"
+                    % (tmp_path / "calls.log"))
+    fake.chmod(fake.stat().st_mode | stat.S_IEXEC)
+    monkeypatch.setenv("PATH", str(bin_dir) + os.pathsep + os.environ["PATH"])
+
+    fig = _model_figure()
+    template = autogpy.FigureTemplate(fig, compress="gz")
+    for i in range(3):
+        template.add_instance((XX_test_linspace, i * XX_test_linspace),
+                              (XX_test_linspace, XX_test_linspace))
+
+    outputs = template.render("pdfcairo")
+    assert outputs == ["test_plot/figtest__inst%d.pdf" % i for i in range(3)]
+    assert all(os.path.isfile(x) for x in outputs)
+    assert (tmp_path / "calls.log").read_text() == "figtest__.template.pdfcairo.gnu\n"
+    assert "template pdfcairo" in fig.render_stats.renders
+    assert os.path.isfile("test_plot/figtest__inst2__0__.dat.gz")
+    with open("test_plot/figtest__.template.pdfcairo.gnu") as f:
+        assert 'sprintf("< gzip -dc \'figtest__inst%d__0__.dat.gz\'", AUTOGPY_I)' in f.read()
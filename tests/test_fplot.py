@@ -0,0 +1,95 @@
+import autogpy
+from autogpy import sampling
+import math
+import multiprocessing
+import numpy as np
+import pytest
+
+_parent_calls = []
+
+
+def _slow_scalar(x):
+    return math.sin(x)
+
+
+def _recorded_scalar(x):
+    # the calls in the pool workers are not seen by the parent
+    _parent_calls.append(x)
+    return math.sin(x)
+
+
+def test_vectorized_single_call():
+    calls = []
+
+    def foo(x):
+        calls.append(x)
+        return np.sin(x)
+
+    y = sampling.evaluate(foo, np.linspace(0, 1, 100))
+    assert len(calls) == 1
+    assert np.allclose(y, np.sin(np.linspace(0, 1, 100)))
+
+
+def test_scalar_fallback_and_pool():
+    x = np.linspace(0, 1, 20)
+    assert np.allclose(sampling.evaluate(math.sin, x), np.sin(x))
+    assert np.allclose(sampling.evaluate(_slow_scalar, x, n_jobs=2),
+                       np.sin(x))
+
+
+def test_automatic_pool(monkeypatch):
+    monkeypatch.setattr(sampling, "POOL_MIN_SECONDS", 0.)
+    monkeypatch.setattr(sampling.os, "cpu_count", lambda: 2)
+    x = np.linspace(0, 1, 20)
+    del _parent_calls[:]
+    y = sampling.evaluate(_recorded_scalar, x, vectorize=False)
+    assert np.allclose(y, np.sin(x))
+    # the first value is not computed again by the pool
+    assert _parent_calls == [0.]
+
+    monkeypatch.setattr(sampling.os, "cpu_count", lambda: 1)
+    del _parent_calls[:]
+    sampling.evaluate(_recorded_scalar, x, vectorize=False)
+    assert _parent_calls == list(x)
+
+    # functions of __main__ cannot be imported by spawned workers
+    def foo(x):
+        return x
+    foo.__module__ = "__main__"
+    monkeypatch.setattr(multiprocessing, "get_start_method", lambda allow_none=False: "spawn")
+    assert not sampling._can_use_pool(foo)
+    assert not sampling._can_use_pool(lambda x: x)
+    assert sampling._can_use_pool(_slow_scalar)
+
+
+def test_explicit_pool_with_lambda():
+    x = np.linspace(0, 1, 20)
+    with pytest.warns(UserWarning, match="serially"):
+        y = sampling.evaluate(lambda xx: math.sin(xx), x, n_jobs=2, vectorize=False)
+    assert np.allclose(y, np.sin(x))
+
+
+def test_adaptive_refines_sharp_features():
+    x, y = sampling.adaptive_sampling(lambda x: np.tanh(50 * x),
+                                      np.linspace(-5, 5, 33))
+    assert np.all(np.diff(x) > 0)
+    assert np.allclose(y, np.tanh(50 * x))
+    # far fewer samples than an equispaced sampling resolving the step
+    assert len(x) < 200
+    assert np.sum(np.abs(x) < .1) > np.sum(np.abs(x) > 4)
+
+
+def test_adaptive_max_points():
+    x, _ = sampling.adaptive_sampling(np.sign, np.linspace(-1, 1, 10),
+                                      tol=0, max_points=50)
+    assert len(x) == 50
+
+
+def test_fplot_adaptive(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    with autogpy.Figure("test_plot", file_identifier="figtest") as fig:
+        fig.fplot(math.sin, (0, 10), adaptive=True)
+
+    data = np.loadtxt("test_plot/figtest__0__.dat")
+    assert data[0, 0] == 0 and data[-1, 0] == 10
+    assert np.allclose(data[:, 1], np.sin(data[:, 0]))
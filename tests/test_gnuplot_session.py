@@ -0,0 +1,50 @@
+import autogpy.gnuplot_session as gs
+import pytest
+import sys
+
+# mimics gnuplot in interactive mode: echoes `print` strings, dies on `crash`
+FAKE_GNUPLOT = r'''
+import sys
+for line in sys.stdin:
+    line = line.strip()
+    if line == "crash":
+        sys.exit(1)
+    if line.startswith("print "):
+        print(line[len("print "):].strip('"'), flush=True)
+    elif line.startswith("load "):
+        print("loaded " + line[len("load "):], flush=True)
+'''
+
+
+@pytest.fixture
+def session(tmp_path):
+    fake = tmp_path / "fake_gnuplot.py"
+    fake.write_text(FAKE_GNUPLOT)
+    s = gs.GnuplotSession(command=[sys.executable, str(fake)], timeout=10)
+    yield s
+    s.close()
+
+
+def test_session_sentinel_protocol(session):
+    assert session.execute('print "hello"') == "hello\n"
+    pid = session._proc.pid
+    assert session.execute('print "again"') == "again\n"
+    # the process is reused
+    assert session._proc.pid == pid
+
+
+def test_session_load_resets_state(session, tmp_path):
+    out = session.load("fig__.jpg.gnu", cwd=str(tmp_path))
+    assert out == "loaded 'fig__.jpg.gnu'\n"
+
+
+def test_session_crash_detection_and_restart(session):
+    session.execute('print "hello"')
+    pid = session._proc.pid
+
+    with pytest.raises(gs.GnuplotSessionError):
+        session.execute("crash")
+    assert not session.is_alive()
+
+    assert session.execute('print "back"') == "back\n"
+    assert session._proc.pid != pid
@@ -0,0 +1,53 @@
+import array
+import autogpy
+from autogpy import histogram
+import gzip
+import numpy as np
+import pytest
+
+SAMPLES = np.random.RandomState(0).randn(100003)
+
+
+@pytest.mark.parametrize("hist_kw", [
+    {}, {"bins": 50}, {"bins": 30, "range": (-1, 1)},
+    {"bins": np.linspace(-3, 3, 7)}, {"bins": 20, "density": True},
+    {"weights": np.random.RandomState(1).rand(SAMPLES.size)},
+])
+def test_chunked_matches_numpy(hist_kw):
+    counts, edges = histogram.histogram(SAMPLES, chunk_size=1000,
+                                        max_workers=3, **hist_kw)
+    ref_counts, ref_edges = np.histogram(SAMPLES, **hist_kw)
+    assert np.allclose(counts, ref_counts)
+    assert np.allclose(edges, ref_edges)
+
+
+def test_iterator_of_chunks():
+    chunks = (SAMPLES[i:i + 1000] for i in range(0, SAMPLES.size, 1000))
+    counts, _ = histogram.histogram(chunks, bins=40, range=(-5, 5))
+    assert np.array_equal(counts, np.histogram(SAMPLES, 40, (-5, 5))[0])
+
+    with pytest.raises(ValueError):
+        histogram.histogram(iter([SAMPLES]), bins=40)
+
+
+def test_hist_generic_memmap(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    np.save("samples.npy", SAMPLES)
+    with autogpy.Figure("test_plot", file_identifier="figtest") as fig:
+        fig.hist_generic("samples.npy", "w l", hist_kw={"bins": 20},
+                         dump_data=True)
+
+    data = np.loadtxt("test_plot/figtest__0__.dat")
+    assert np.array_equal(data[:, 1], np.histogram(SAMPLES, 20)[0])
+    with gzip.open("test_plot/figtest__0__.dat.hist_compl_dump.dat.gz") as f:
+        assert np.array_equal(np.loadtxt(f), SAMPLES)
+
+
+@pytest.mark.parametrize("make_input", [
+    lambda: range(1000), lambda: array.array("d", np.arange(1000.)),
+])
+def test_non_ndarray_sequences(make_input):
+    counts, edges = histogram.histogram(make_input(), bins=7, max_workers=2)
+    ref_counts, ref_edges = np.histogram(np.arange(1000.), bins=7)
+    assert np.array_equal(counts, ref_counts)
+    assert np.allclose(edges, ref_edges)
@@ -0,0 +1,28 @@
+import os
+import subprocess
+import sys
+
+# seconds, on top of numpy (which autogpy requires)
+IMPORT_TIME_BUDGET = .5
+
+LAZY_MODULES = ["pandas", "pygments", "IPython", "scipy", "matplotlib"]
+
+_SCRIPT = """
+import sys, time
+import numpy
+t0 = time.perf_counter()
+import autogpy
+print(time.perf_counter() - t0)
+print(",".join(m for m in %r if m in sys.modules))
+""" % LAZY_MODULES
+
+
+def test_import_is_lazy_and_fast():
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ)
+    env["PYTHONPATH"] = root + os.pathsep + env.get("PYTHONPATH", "")
+    out = subprocess.check_output([sys.executable, "-c", _SCRIPT], env=env,
+                                  universal_newlines=True).splitlines()
+
+    assert out[1] == ""
+    assert float(out[0]) < IMPORT_TIME_BUDGET
@@ -0,0 +1,78 @@
+import autogpy
+import numpy as np
+import os
+
+XX_test_linspace = np.linspace(0, 1, 50)
+
+
+def _build_figure(yy):
+    with autogpy.Figure("test_plot", file_identifier="figtest") as fig:
+        fig.set(key="above")
+        fig.plot(XX_test_linspace, yy)
+    return fig
+
+
+def _mtimes(folder):
+    return {f: os.path.getmtime(os.path.join(folder, f))
+            for f in os.listdir(folder) if f.startswith("figtest")}
+
+
+def _age_files(folder):
+    for f in os.listdir(folder):
+        os.utime(os.path.join(folder, f), (0, 0))
+
+
+def test_unchanged_figure_is_not_rewritten(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    _build_figure(XX_test_linspace)
+    _age_files("test_plot")
+
+    _build_figure(XX_test_linspace)
+    assert set(_mtimes("test_plot").values()) == {0}
+
+
+def test_changed_dataset_only_rewrites_dataset(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    _build_figure(XX_test_linspace)
+    _age_files("test_plot")
+
+    _build_figure(2 * XX_test_linspace)
+    mtimes = _mtimes("test_plot")
+    assert mtimes.pop("figtest__0__.dat") != 0
+    assert set(mtimes.values()) == {0}
+
+
+def test_makefile_deps_on_datasets(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    _build_figure(XX_test_linspace)
+
+    with open("test_plot/figtest__.deps.mk") as f:
+        deps = f.read()
+    assert "figtest__.pdf figtest__.tikz.pdf: figtest__0__.dat" in deps
+
+    with open("test_plot/Makefile") as f:
+        assert "-include $(wildcard *.deps.mk)" in f.read()
+
+
+def test_scaffolding_written_at_generation_only(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    fig = autogpy.Figure("test_plot", file_identifier="figtest")
+    assert os.listdir("test_plot") == []
+
+    fig.generate_gnuplot_file()
+    assert {"Makefile", "sync_me.sh"} <= set(os.listdir("test_plot"))
+
+    _age_files("test_plot")
+    autogpy.Figure("test_plot", file_identifier="figtest").generate_gnuplot_file()
+    assert os.path.getmtime("test_plot/Makefile") == 0
+    assert os.path.getmtime("test_plot/sync_me.sh") == 0
+
+
+def test_datasets_follow_umask(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    umask = os.umask(0o022)
+    try:
+        _build_figure(XX_test_linspace)
+    finally:
+        os.umask(umask)
+    assert os.stat("test_plot/figtest__0__.dat").st_mode & 0o777 == 0o644
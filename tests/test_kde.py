@@ -0,0 +1,34 @@
+import autogpy
+from autogpy import kde
+import numpy as np
+import pytest
+
+scipy_stats = pytest.importorskip("scipy.stats")
+
+RS = np.random.RandomState(0)
+BIMODAL = np.concatenate([RS.randn(5000), 5 + .1 * RS.randn(3000)])
+
+
+@pytest.mark.parametrize("bw_method", [None, "scott", "silverman", .3])
+@pytest.mark.parametrize("weighted", [False, True])
+def test_fft_kde_within_tolerance(bw_method, weighted):
+    weights = RS.rand(BIMODAL.size) if weighted else None
+    points = np.linspace(-5, 7, 300)
+    exact = scipy_stats.gaussian_kde(BIMODAL, bw_method, weights)(points)
+    fast = kde.fft_kde(BIMODAL, points, bw_method, weights, chunk_size=1000)
+    # documented tolerance
+    assert np.abs(exact - fast).max() < 1e-3 * exact.max()
+
+
+def test_hist_generic_kde_method(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    with autogpy.Figure("test_plot", file_identifier="figtest") as fig:
+        fig.hist_generic(BIMODAL, "w l", hist_kw={"bins": 40}, kde=True)
+        fig.hist_generic(BIMODAL, "w l", hist_kw={"bins": 40}, kde=True,
+                         kde_method="fft")
+        with pytest.raises(ValueError):
+            fig.hist_generic(BIMODAL, "w l", kde=True, kde_method="nope")
+
+    exact = np.loadtxt("test_plot/figtest__0__.dat")
+    fast = np.loadtxt("test_plot/figtest__1__.dat")
+    assert np.abs(exact[:, 1] - fast[:, 1]).max() < 1e-3 * exact[:, 1].max()
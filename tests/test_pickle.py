@@ -0,0 +1,47 @@
+import autogpy
+import numpy as np
+import os
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+
+XX_test_linspace = np.linspace(0, 1, 10000)
+
+
+def _generate(fig):
+    fig.generate_gnuplot_file()
+    return fig
+
+
+def test_pickle_carries_no_bulk_data(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    fig = autogpy.Figure("test_plot", file_identifier="figtest", deferred_writes=True)
+    fig.set(key="above")
+    fig.plot("w l", XX_test_linspace, XX_test_linspace ** 2)
+    fig.plot(XX_test_linspace, data_format="binary")
+
+    state = pickle.dumps(fig)
+    assert len(state) < XX_test_linspace.nbytes / 10
+    # the deferred writes are waited for
+    assert os.path.isfile("test_plot/figtest__1__.bin")
+
+    clone = pickle.loads(state)
+    assert clone.get_gnuplot_file_content() == fig.get_gnuplot_file_content()
+    assert clone.globalize_fname("a.dat") == "test_plot/a.dat"
+
+
+def test_generate_in_process_pool(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    figs = []
+    for i in range(2):
+        fig = autogpy.Figure("test_plot", file_identifier="fig%d" % i)
+        fig.plot(XX_test_linspace, i * XX_test_linspace)
+        figs.append(fig)
+
+    with ProcessPoolExecutor(max_workers=2) as executor:
+        generated = list(executor.map(_generate, figs))
+
+    for fig, clone in zip(figs, generated):
+        assert os.path.isfile("test_plot/%s__.pdflatex_compile.sh" % fig.file_identifier)
+        assert clone.get_render_command("pdflatex")['output'] == \
+            "test_plot/%s__.pdf" % fig.file_identifier
+        assert clone.render_stats.script['bytes'] > 0
@@ -0,0 +1,78 @@
+import autogpy
+import numpy as np
+import os
+import stat
+import subprocess
+
+XX_test_linspace = np.linspace(0, 1, 50)
+
+
+def _fake_toolchain(bin_dir):
+    """stand-ins for the tools run by the pdflatex compile script. The final
+    pdf holds the name of the gnuplot wrapper, passed along the intermediates.
+    """
+    os.makedirs(bin_dir)
+    scripts = {
+        "gnuplot": "out=$(sed -n \"s/^set output '\\(.*\\)'/\\1/p\" \"$1\"); echo \"$1\" > \"$out\"",
+        "latex": 'cp "$3" "${3%.tex}.dvi"',
+        "dvips": 'cp "$1" "$3"',
+        "ps2eps": "",
+        "ps2pdf": 'cp "$1" "$2"',
+        "pdftoppm": "",
+    }
+    for name, body in scripts.items():
+        path = os.path.join(bin_dir, name)
+        with open(path, "w") as f:
+            f.write("#!/bin/sh\nsleep 0.05\n%s\n" % body)
+        os.chmod(path, os.stat(path).st_mode | stat.S_IEXEC)
+
+
+def test_compile_scripts_use_per_figure_build_dirs(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    fig = autogpy.Figure("test_plot", file_identifier="figtest")
+    fig.plot(XX_test_linspace)
+    fig.generate_gnuplot_file()
+
+    for terminal in ["pdflatex", "tikz"]:
+        with open(os.path.join("test_plot", fig.get_render_command(terminal)['command'][1])) as f:
+            script = f.read()
+        assert "figtest__.%s.build" % terminal in script
+        assert "rm *" not in script
+    with open("test_plot/figtest__.pdflatex.gnu") as f:
+        assert "set output 'figtest__.pdflatex.build/plot_out.tex'" in f.read()
+
+
+def test_project_makefile_parallel_build(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    _fake_toolchain(str(tmp_path / "bin"))
+    monkeypatch.setenv("PATH", str(tmp_path / "bin") + os.pathsep
+                       + os.environ["PATH"])
+
+    figs = []
+    for i in range(6):
+        fig = autogpy.Figure("project/test_plot_%d" % (i % 2), file_identifier="fig%d" % i)
+        fig.plot(XX_test_linspace, i * XX_test_linspace)
+        fig.generate_gnuplot_file()
+        figs.append(fig)
+
+    makefile = autogpy.write_project_makefile("project")
+    with open(makefile) as f:
+        assert "FIGURE_DIRS=test_plot_0 test_plot_1" in f.read()
+    assert autogpy.write_project_makefile("project", folders=figs) == makefile
+
+    subprocess.check_call(["make", "-s", "-j12", "TARGET=latex"], cwd="project",
+                          stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    for i in range(6):
+        folder = "project/test_plot_%d/" % (i % 2)
+        with open(folder + "fig%d__.pdf" % i) as f:
+            assert f.read().strip() == "fig%d__.pdflatex.gnu" % i
+        assert not os.path.exists(folder + "fig%d__.pdflatex.build" % i)
+
+    # datasets are prerequisites of the figures
+    later = os.path.getmtime("project/test_plot_1/fig3__.pdf") + 10
+    os.utime("project/test_plot_1/fig3__0__.dat", (later, later))
+    out = subprocess.check_output(["make", "-n", "TARGET=latex"], cwd="project",
+                                  universal_newlines=True)
+    assert "fig3__.pdflatex_compile.sh" in out
+    assert "fig1__.pdflatex_compile.sh" not in out
@@ -0,0 +1,123 @@
+import autogpy
+import numpy as np
+import os
+import subprocess
+import sys
+import types
+
+XX_test_linspace = np.linspace(0, 1, 50)
+
+
+def _cache_key(fig, terminal="pdflatex"):
+    return fig._AutoGnuplotFigure__render_cache_key(terminal)
+
+
+def _figure(yy, **kw):
+    fig = autogpy.Figure("test_plot", file_identifier="figtest", **kw)
+    fig.plot(XX_test_linspace, yy)
+    fig.generate_gnuplot_file()
+    return fig
+
+
+def test_render_cache_key(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    key = _cache_key(_figure(XX_test_linspace))
+
+    assert _cache_key(_figure(XX_test_linspace)) == key
+    assert _cache_key(_figure(XX_test_linspace), "tikz") != key
+    # dataset content
+    assert _cache_key(_figure(2 * XX_test_linspace)) != key
+
+    # terminal parameters
+    fig = _figure(XX_test_linspace)
+    fig.set_figure_size(x_size="12cm")
+    assert _cache_key(fig) != key
+
+    fig = _figure(XX_test_linspace, jpg_convert_density=300)
+    assert _cache_key(fig) != key
+
+
+def _fake_ipython(monkeypatch):
+    displayed = []
+    fake_display = types.ModuleType("IPython.core.display")
+    fake_display.Image = lambda fname, **kw: fname
+    fake_display.display = displayed.append
+    for name in ["IPython", "IPython.core"]:
+        monkeypatch.setitem(sys.modules, name, types.ModuleType(name))
+    monkeypatch.setitem(sys.modules, "IPython.core.display", fake_display)
+    return displayed
+
+
+def _fake_render(fig, monkeypatch):
+    """stands in for the compile script, writing the preview and the pdf. Returns the list of the calls."""
+    calls = []
+
+    def render(command_to_call, use_session=False, terminal=None):
+        render_command = fig.get_render_command(terminal)
+        calls.append(terminal)
+        for fname in [render_command['preview'], render_command['output']]:
+            with open(fname, "w") as f:
+                f.write("%s %d" % (os.path.basename(fname), len(calls)))
+        return "", "", 0
+    monkeypatch.setattr(fig, "_AutoGnuplotFigure__run_render_command", render)
+    return calls
+
+
+def test_render_cache_hit_restores_outputs(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    displayed = _fake_ipython(monkeypatch)
+    fig = _figure(XX_test_linspace, render_cache=True)
+    calls = _fake_render(fig, monkeypatch)
+    render_command = fig.get_render_command("pdflatex")
+
+    fig.jupyter_show_pdflatex()
+    assert calls == ["pdflatex"]
+    with open(render_command['output']) as f:
+        pdf = f.read()
+
+    # e.g. after `make clean`
+    os.remove(render_command['output'])
+    os.remove(render_command['preview'])
+
+    def _no_process(*args, **kw):
+        raise AssertionError("no process expected on a cache hit")
+    monkeypatch.setattr(subprocess, "Popen", _no_process)
+
+    fig.jupyter_show_pdflatex()
+    assert calls == ["pdflatex"]
+    cached_image = os.path.join("test_plot", fig.render_cache_folder, _cache_key(fig))
+    assert displayed[-1] == cached_image
+    with open(render_command['output']) as f:
+        assert f.read() == pdf
+    assert os.path.isfile(render_command['preview'])
+
+    # an entry without the cached pdf is a miss
+    os.remove(os.path.splitext(cached_image)[0] + ".pdf")
+    fig.jupyter_show_pdflatex()
+    assert calls == ["pdflatex", "pdflatex"]
+
+
+def test_render_cache_evicts_least_recently_used(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    _fake_ipython(monkeypatch)
+    fig = _figure(XX_test_linspace, render_cache=True)
+    fig.render_cache_size = 2
+    calls = _fake_render(fig, monkeypatch)
+    cache_folder = os.path.join("test_plot", fig.render_cache_folder)
+
+    keys = {}
+    for size in [10, 11, 10, 12]:
+        fig.set_figure_size(x_size="%dcm" % size)
+        fig.generate_gnuplot_file()
+        keys[size] = _cache_key(fig)
+        fig.jupyter_show_pdflatex()
+        # distinct mtimes, older than the next use
+        for x in os.listdir(cache_folder):
+            path = os.path.join(cache_folder, x)
+            os.utime(path, (os.path.getmtime(path) - 10,) * 2)
+    # the third size was a hit
+    assert len(calls) == 3
+
+    # the 11cm entry was the least recently used
+    assert sorted(os.listdir(cache_folder)) == sorted(
+        k[:-len(".png")] + ext for k in [keys[10], keys[12]] for ext in [".png", ".pdf"])
@@ -0,0 +1,82 @@
+import autogpy
+from autogpy import render_stats
+import numpy as np
+import os
+import stat
+import subprocess
+
+XX_test_linspace = np.linspace(0, 1, 50)
+
+
+def _fake_toolchain(bin_dir):
+    """stand-ins for the tools run by the pdflatex compile script."""
+    os.makedirs(bin_dir)
+    scripts = {
+        "gnuplot": "",
+        "latex": "",
+        "dvips": "",
+        "ps2eps": "",
+        "ps2pdf": 'touch "$2"',
+        "pdftoppm": "",
+    }
+    for name, body in scripts.items():
+        path = os.path.join(bin_dir, name)
+        with open(path, "w") as f:
+            f.write("#!/bin/sh\nsleep 0.01\n%s\n" % body)
+        os.chmod(path, os.stat(path).st_mode | stat.S_IEXEC)
+
+
+def test_dataset_and_script_stats(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    fig = autogpy.Figure("test_plot", file_identifier="figtest")
+    fig.plot(XX_test_linspace, XX_test_linspace ** 2)
+    fig.plot(XX_test_linspace, data_format="binary32")
+    fig.generate_gnuplot_file()
+
+    datasets = fig.render_stats.datasets
+    assert [(d['dataset_fname'], d['storage'], d['rows'], d['columns'])
+            for d in datasets] == [("figtest__0__.dat", "file", 50, 2),
+                                   ("figtest__1__.bin", "file", 50, 1)]
+    assert datasets[1]['bytes'] == 50 * 4
+    assert all(d['seconds'] >= 0 for d in datasets)
+    assert fig.render_stats.script['bytes'] == \
+        os.path.getsize("test_plot/figtest__.core.gnu")
+
+
+def test_compile_script_tool_timings(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    _fake_toolchain(str(tmp_path / "bin"))
+    monkeypatch.setenv("PATH", str(tmp_path / "bin") + os.pathsep
+                       + os.environ["PATH"])
+
+    figs = []
+    for i in range(2):
+        fig = autogpy.Figure("test_plot", file_identifier="fig%d" % i)
+        fig.plot(XX_test_linspace, i * XX_test_linspace)
+        fig.generate_gnuplot_file()
+        command = fig.get_render_command("pdflatex")
+        subprocess.check_call(command['command'], cwd=command['cwd'],
+                              stdout=subprocess.DEVNULL)
+        fig.record_render_stats("pdflatex", 1.)
+        figs.append(fig)
+
+    tools = figs[0].render_stats.renders["pdflatex"]["tools"]
+    assert list(tools) == ["gnuplot", "latex", "dvips", "ps2eps", "ps2pdf",
+                           "convert"]
+    assert all(t >= .01 for t in tools.values())
+
+    total = autogpy.aggregate_render_stats(figs)
+    assert total['figures'] == 2
+    assert total['datasets']['count'] == 2
+    assert total['datasets']['rows'] == 100
+    assert total['tools']['latex']['count'] == 2
+    assert total['tools']['pdflatex wall']['total'] == 2.
+
+
+def test_parse_timings_partial(tmp_path):
+    fname = str(tmp_path / "fig.timings")
+    with open(fname, "w") as f:
+        f.write("gnuplot 10.0\nlatex 10.5\ndvips 12.0\n")
+    assert dict(render_stats.parse_timings(fname)) == {"gnuplot": .5,
+                                                       "latex": 1.5}
+    assert render_stats.parse_timings(str(tmp_path / "missing")) == {}
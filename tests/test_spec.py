@@ -0,0 +1,71 @@
+import autogpy
+import json
+import numpy as np
+import os
+import pytest
+
+XX_test_linspace = np.linspace(0, 1, 50)
+
+
+def _build_figure():
+    fig = autogpy.Figure("project/test_plot", file_identifier="figtest",
+                         dataset_store="project/store", tikz_enabled=True)
+    fig.add_variable_declaration("D", 2)
+    fig.set_figure_size(x_size="12cm")
+    fig.set_multiplot("layout 1,2")
+    fig.plot("w l", XX_test_linspace, XX_test_linspace ** 2)
+    fig.next_multiplot_group()
+    fig.alter_current_multiplot_parameters("set key above")
+    fig.plot(XX_test_linspace, data_format="binary")
+    fig.plot(XX_test_linspace, data_format="binary")
+    return fig
+
+
+def test_spec_roundtrip(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    fig = _build_figure()
+    path = fig.save_spec()
+    assert path == "project/test_plot/figtest__.spec.json"
+    with open(path) as f:
+        assert json.load(f)["folder_name"] == "."
+
+    # reloaded from another working folder
+    os.mkdir("elsewhere")
+    monkeypatch.chdir(tmp_path / "elsewhere")
+    loaded = autogpy.Figure.load_spec("../" + path)
+
+    assert loaded.folder_name == "../project/test_plot"
+    assert loaded.dataset_store.root == "../project/store"
+    assert loaded.get_gnuplot_file_content() == fig.get_gnuplot_file_content()
+    assert loaded.pdflatex_terminal_parameters["x_size"] == "12cm"
+    assert loaded.terminals_enabled_by_default["tikz"]["is_enabled"]
+
+    # restyling and new datasets
+    loaded.set(xrange="[0:2]")
+    loaded.plot(XX_test_linspace, data_format="binary")
+    loaded.generate_gnuplot_file()
+    with open("../project/test_plot/figtest__.core.gnu") as f:
+        core = f.read()
+    assert "set xrange [0:2]" in core
+    assert "set key above" in core
+
+
+def test_spec_inline_and_checks(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    fig = autogpy.Figure("test_plot", file_identifier="figtest", data_storage="inline")
+    fig.plot(XX_test_linspace)
+    fig.plot(XX_test_linspace, data_format="binary")
+    path = fig.save_spec("test_plot/my_spec.json")
+
+    loaded = autogpy.Figure.load_spec(path, verbose=True)
+    assert loaded.verbose
+    assert loaded.get_gnuplot_file_content() == fig.get_gnuplot_file_content()
+
+    os.remove("test_plot/figtest__1__.bin")
+    with pytest.warns(UserWarning, match="figtest__1__.bin"):
+        autogpy.Figure.load_spec(path)
+
+    with open("not_a_spec.json", "w") as f:
+        f.write("{}")
+    with pytest.raises(ValueError):
+        autogpy.Figure.load_spec("not_a_spec.json")